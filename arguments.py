@@ -8,6 +8,7 @@ from SCons.Variables import Variables, EnumVariable
 from config import * #IGNORE:W0611
 from os.path import join, abspath
 from echoutil import loginfo
+import diskcache
 import os
 import sys
 
@@ -135,6 +136,14 @@ else:
 PYTHON_COMPILER = GetArg("pycompiler", "Enable Python source compilation into bytecode. Points to Python executable.", None )
 PYTHON_DOZIP    = GetArg("pythondozip", "Zip all python sources into a single archive. Path to the file on device", None )
 
+#: Folder for caching compiled Python bytecode. 'none' disables the cache.
+PYC_CACHE = GetArg( "pyccache", "Folder for caching compiled Python bytecode. 'none' to disable.",
+                    join( USERCONFIG_FOLDER, "pyccache" ), caseless = False )
+if PYC_CACHE == "none":
+    PYC_CACHE = None
+#: Size limit of the bytecode cache in megabytes
+PYC_CACHE_SIZE = int( GetArg( "pyccache_size", "Size limit of the bytecode cache in megabytes.", "256" ) )
+
 _p = os.environ["PATH"]
 #CSL_ARM_TOOLCHAIN_FOLDER_NAME = "CSL Arm Toolchain\\bin"
 #if sys.platform == "linux2":
@@ -162,6 +171,82 @@ WINSCW_OPTIMIZATION_FLAGS = GetArg( "winscw_options", "WINSCW compiler options."
                                     caseless = False )
 
 
+#: Folder containing the binaries of the selected compiler.
+#: Given explicitly, the compiler is not searched from PATH.
+TOOLCHAIN = GetArg( "toolchain", "Folder of the compiler binaries. Skips searching them from PATH.",
+                    None, caseless = False )
+
+#: Path to JSON lines file for the compiler warnings and errors
+DIAGNOSTICS_FILE = GetArg( "diagnostics", "Write compiler warnings and errors to a JSON lines file.",
+                           None, caseless = False )
+
+#: Path to Chrome trace-event file for build phase timing
+TRACE_FILE = GetArg( "trace", "Write timing of the build phases to a Chrome trace-event JSON file.",
+                     None, caseless = False )
+
+#: Folder for caching GCCE link and elf2e32 outputs. Can be on a shared file system.
+ARTIFACT_CACHE = GetArg( "artifactcache", "Folder for caching link and elf2e32 outputs.",
+                         None, caseless = False )
+#: Size limit of the artifact cache in megabytes
+ARTIFACT_CACHE_SIZE = int( GetArg( "artifactcache_size", "Size limit of the artifact cache in megabytes.",
+                                   "2048" ) )
+
+#: Folder for caching compiled objects. Can be on a shared file system.
+OBJECT_CACHE = GetArg( "objcache", "Folder for caching compiled objects.",
+                       None, caseless = False )
+#: Size limit of the object cache in megabytes
+OBJECT_CACHE_SIZE = int( GetArg( "objcache_size", "Size limit of the object cache in megabytes.",
+                                 "4096" ) )
+
+#: Folder for caching compiled preppy templates. 'none' disables the disk cache.
+PREPPY_CACHE = GetArg( "preppycache", "Folder for caching compiled pkg templates. 'none' to disable.",
+                       join( USERCONFIG_FOLDER, "preppycache" ), caseless = False )
+if PREPPY_CACHE == "none":
+    PREPPY_CACHE = None
+
+#: Folder for caching converted icons. Can be on a shared file system.
+MIF_CACHE = GetArg( "mifcache", "Folder for caching mifconv outputs. 'none' to disable.",
+                    join( USERCONFIG_FOLDER, "mifcache" ), caseless = False )
+if MIF_CACHE == "none":
+    MIF_CACHE = None
+#: Size limit of the icon cache in megabytes
+MIF_CACHE_SIZE = int( GetArg( "mifcache_size", "Size limit of the mifconv cache in megabytes.", "256" ) )
+
+CACHE_STATS = GetArg( "cachestats", "Print cache statistics at the end of the build.", "true", [ "true", "false"] )
+CACHE_STATS = ( CACHE_STATS == "true" )
+
+#: How the results are staged into the package, emulator and SDK folders.
+#: Copied if linking is not possible.
+STAGE = GetArg( "stage", "Stage files by hardlinking, reflinking or copying them.",
+                "copy", [ "link", "reflink", "copy" ] )
+
+#: Number of sources combined into one unity source. Disabled if less than 2.
+UNITY = int( GetArg( "unity", "Compile sources in batches of N combined sources. 0 to disable.", "0" ) )
+
+#: Distributed GCCE compilation. distcc is used by default if DISTCC_HOSTS is set.
+DISTCC = "none"
+if os.environ.get( "DISTCC_HOSTS", "" ) != "":
+    DISTCC = "distcc"
+DISTCC = GetArg( "distcc", "Compile GCCE sources remotely with distcc or icecc.",
+                 DISTCC, [ "none", "distcc", "icecc" ] )
+#: Number of parallel jobs for distributed compilation. By default the
+#: slots of the distcc hosts are summed unless -j is given.
+DISTCC_JOBS = GetArg( "distcc_jobs", "Parallel jobs with distcc/icecc. Default: sum of the host slots.", None )
+
+#: Seconds the wineserver is kept running after the last SDK tool on Linux.
+#: 0 leaves starting the server to wine.
+WINESERVER_TIMEOUT = int( GetArg( "wineserver", "Keep wineserver running N seconds after the last wine tool. 0 to disable.",
+                                  "60" ) )
+WINE_BATCH = GetArg( "winebatch", "Run resource tools through long-lived wine shells.", "false", [ "true", "false"] )
+WINE_BATCH = ( WINE_BATCH == "true" )
+
+#: Preprocessor for resources. 'host' uses cpp of the host instead of the SDK's one.
+RESOURCE_CPP = GetArg( "resourcecpp", "Preprocessor for resources: SDK's cpp or cpp of the host.",
+                       "sdk", [ "sdk", "host" ] )
+
+PCH_ENABLED = GetArg( "pch", "Precompile the system header included into every source.", "false", [ "true", "false"] )
+PCH_ENABLED = ( PCH_ENABLED == "true" )
+
 MMP_EXPORT_ENABLED = GetArg( "mmpexport", "Enable MMP export(if configured).", "false", [ "true", "false"] )
 MMP_EXPORT_ENABLED = MMP_EXPORT_ENABLED == "true"
 
@@ -194,16 +279,15 @@ SYMBIAN_VERSION = ( 9 , 1 )
 #: S60 3rd & mr = EPOC32_INCLUDE + variant + symbian_os_v9.1.hrh
 PLATFORM_HEADER = join( EPOC32_INCLUDE, "variant" )
 
-def _resolve_platform():
-    """Find out current SDK version"""
-    global PLATFORM_HEADER, UI_PLATFORM, UI_VERSION, SYMBIAN_VERSION
-
-    if not RUNNING_SCONS:
-        return
+#: SDK probe cache mode. The probe results are cached per EPOCROOT.
+SDKPROBE = GetArg( "sdkprobe", "SDK version probing. 'refresh' ignores the cached results.",
+                   "cache", [ "cache", "refresh" ] )
 
-    if not os.path.exists( PLATFORM_HEADER ):
-        raise RuntimeError( "'%s' does not exist. Invalid EPOCROOT?" % PLATFORM_HEADER )
+def _probe_platform():
+    """Find out current SDK version from the variant headers and manifest.xml
 
+    @return: ( platform header, ui platform, ui version, symbian version )
+    """
     # These are the same on S60
     sdk_header = ""
     symbian_header = ""
@@ -251,10 +335,42 @@ def _resolve_platform():
     else: #UIQ
         symbian_version = symbian_header.split( "_v" )[1].split( "." )[:2]
 
-    PLATFORM_HEADER = sdk_header
-    UI_PLATFORM = uiplatform
-    UI_VERSION = tuple( map( int, uiversion ) )
-    SYMBIAN_VERSION = tuple( map( int, symbian_version ) )
+    return ( sdk_header, uiplatform,
+             tuple( map( int, uiversion ) ),
+             tuple( map( int, symbian_version ) ) )
+
+def _resolve_platform():
+    """Find out current SDK version. The probe results are cached and reused
+    as long as the variant folder and manifest.xml are not modified.
+    """
+    global PLATFORM_HEADER, UI_PLATFORM, UI_VERSION, SYMBIAN_VERSION
+
+    if not RUNNING_SCONS:
+        return
+
+    try:
+        variant_mtime = os.stat( PLATFORM_HEADER ).st_mtime
+    except OSError:
+        raise RuntimeError( "'%s' does not exist. Invalid EPOCROOT?" % PLATFORM_HEADER )
+
+    try:
+        manifest_mtime = os.stat( join( EPOC32, "kit", "manifest.xml" ) ).st_mtime
+    except OSError: # UIQ SDKs do not have the manifest
+        manifest_mtime = None
+
+    cache = diskcache.load( "sdkprobe" )
+    key = ( abspath( EPOCROOT ), variant_mtime, manifest_mtime )
+
+    result = cache.get( key )
+    if result is None or SDKPROBE == "refresh":
+        result = _probe_platform()
+        # Drop the stale results of this SDK
+        for old in [ x for x in cache if x[0] == key[0] ]:
+            del cache[old]
+        cache[key] = result
+        diskcache.save( "sdkprobe", cache )
+
+    PLATFORM_HEADER, UI_PLATFORM, UI_VERSION, SYMBIAN_VERSION = result
 
 _resolve_platform()
 
@@ -384,27 +500,44 @@ for _x in [ "-h", "-H", "--help"]:
         __generate_help_message()
         break
 
+#: Executables used to detect the toolchain folders
+GCCE_EXECUTABLES   = [ "arm-none-symbianelf-gcc", "arm-none-symbianelf-gcc.exe" ]
+WINSCW_EXECUTABLES = [ "mwccsym2.exe", "MWCCSYM2.EXE" ]
+
+def _find_toolchain( name, executables ):
+    """Find the first PATH folder containing one of the executables.
+
+    The executables are checked directly instead of listing the folders.
+    PATH is walked in order up to the first hit, which is the toolchain
+    the tools are run from by name. A folder remembered from an earlier
+    run could be shadowed by another toolchain earlier in PATH, so the
+    folder is not cached.
+    @return: Folder or None if not found.
+    """
+    for folder in _p.split( os.path.pathsep ):
+        if folder == "":
+            continue
+        for exe in executables:
+            if os.path.isfile( join( folder, exe ) ):
+                return folder
+    return None
+
 PATH_ARM_TOOLCHAIN = None
 def checkGCCE():
     global PATH_ARM_TOOLCHAIN
-    paths = _p.split( os.path.pathsep )
-    for p in paths:
-        try:
-            items = os.listdir( p )
-        except WindowsError, msg: # TODO: WindowsError on windows... how about linux?
-            print msg
-            continue
+    PATH_ARM_TOOLCHAIN = _find_toolchain( COMPILER_GCCE, GCCE_EXECUTABLES )
+    return PATH_ARM_TOOLCHAIN is not None
 
-        for i in items:
-            if i.startswith( "arm-none-symbianelf" ):
-                PATH_ARM_TOOLCHAIN = p
-                return True
-    return False
+if TOOLCHAIN is not None:
+    # Make sure the given toolchain is used instead of one found from PATH
+    os.environ["PATH"] = os.path.pathsep.join( [ TOOLCHAIN, os.environ["PATH"] ] )
+    if COMPILER == COMPILER_GCCE:
+        PATH_ARM_TOOLCHAIN = TOOLCHAIN
 
 # Check if GCCE setup is correct
 #if len( PATH_ARM_TOOLCHAIN ) > 0:
 #    PATH_ARM_TOOLCHAIN = PATH_ARM_TOOLCHAIN[0]
-if RUNNING_SCONS:
+if RUNNING_SCONS and TOOLCHAIN is None:
     if not checkGCCE():
         print "\nERROR"
         print "-" * 79
@@ -413,12 +546,8 @@ if RUNNING_SCONS:
 
 # Check if WINSCW is found
 def __winscw_in_path():
-    if COMPILER == COMPILER_WINSCW:
-        for x in os.environ["PATH"].split( ";" ):
-            if os.path.exists( x ):
-                if "mwccsym2.exe" in [ x.lower() for x in os.listdir( x ) ]:
-                    return True
-        return False
+    if COMPILER == COMPILER_WINSCW and TOOLCHAIN is None:
+        return _find_toolchain( COMPILER_WINSCW, WINSCW_EXECUTABLES ) is not None
     return True
 
 if not __winscw_in_path() and RUNNING_SCONS:
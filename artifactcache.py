@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for build outputs.
+
+The outputs of a command are stored under a key computed from the expanded
+command line, the contents of the input files and the digest of the tool
+binary. The cache folder can be local or on a shared file system, so
+outputs built by another developer or CI job are reused instead of running
+the tool again. The least recently used entries are removed at exit when
+the cache grows over its size limit.
+
+Used by the GCCE link and elf2e32 steps, see artifactcache=<folder>.
+"""
+__license__ = "MIT License"
+
+from os.path import join, exists, isdir, isfile
+import SCons.Action
+import SCons.Util
+import arguments as ARGS
+import atexit
+import hashlib
+import os
+import shutil
+import thread
+import threading
+
+#: Cache instances by name
+CACHES = {}
+
+#: Digests of files by ( path, mtime, size )
+_DIGESTS = {}
+
+def file_digest( path ):
+    """Compute sha1 of file contents. Memoized while the file is unchanged."""
+    st = os.stat( path )
+    memokey = ( path, st.st_mtime, st.st_size )
+    digest = _DIGESTS.get( memokey )
+    if digest is None:
+        h = hashlib.sha1()
+        f = open( path, "rb" )
+        try:
+            block = f.read( 65536 )
+            while block:
+                h.update( block )
+                block = f.read( 65536 )
+        finally:
+            f.close()
+        digest = h.hexdigest()
+        _DIGESTS[memokey] = digest
+    return digest
+
+def tool_digest( tool, env ):
+    """Digest of the tool binary. Tool can be a path or a name in PATH."""
+    tool = tool.strip( '"' )
+    for path in [ tool, tool + ".exe" ]:
+        if isfile( path ):
+            return file_digest( path )
+
+    path = env.WhereIs( tool ) or SCons.Util.WhereIs( tool )
+    if path is not None:
+        return file_digest( path )
+    # Not found, the command will fail anyway
+    return tool
+
+class ArtifactCache( object ):
+    """Cache folder with LRU size limit and hit/miss statistics"""
+
+    def __init__( self, name, folder, maxsize ):
+        """
+        @param name: Name shown in the statistics.
+        @param folder: Cache folder. Created if missing.
+        @param maxsize: Size limit in bytes.
+        """
+        self.name    = name
+        self.folder  = os.path.abspath( folder )
+        self.maxsize = maxsize
+        self.hits    = 0
+        self.misses  = 0
+        self.stored  = 0
+        self.evicted = 0
+        self._lock   = threading.Lock()
+
+    def _count( self, attr ):
+        self._lock.acquire()
+        try:
+            setattr( self, attr, getattr( self, attr ) + 1 )
+        finally:
+            self._lock.release()
+
+    def entry( self, key ):
+        return join( self.folder, key[:2], key )
+
+    def fetch( self, key, outputs ):
+        """Copy cached files to outputs.
+        @return: True if found from cache.
+        """
+        entry = self.entry( key )
+        if not isdir( entry ):
+            self._count( "misses" )
+            return False
+
+        try:
+            for index in xrange( len( outputs ) ):
+                cached = join( entry, str( index ) )
+                if exists( cached ):
+                    folder = os.path.dirname( outputs[index] )
+                    if not isdir( folder ):
+                        os.makedirs( folder )
+                    shutil.copyfile( cached, outputs[index] )
+            # Mark as recently used
+            os.utime( entry, None )
+        except ( IOError, OSError ):
+            # Evicted by another build at the same time
+            self._count( "misses" )
+            return False
+
+        self._count( "hits" )
+        return True
+
+    def store( self, key, outputs ):
+        """Store outputs. The entry appears atomically for other builds."""
+        entry = self.entry( key )
+        if isdir( entry ):
+            return
+
+        tmp = "%s.%d.%d" % ( entry, os.getpid(), thread.get_ident() )
+        try:
+            os.makedirs( tmp )
+            for index in xrange( len( outputs ) ):
+                if exists( outputs[index] ):
+                    shutil.copyfile( outputs[index], join( tmp, str( index ) ) )
+            os.rename( tmp, entry )
+        except ( IOError, OSError ):
+            # Already stored by another build or unable to write.
+            shutil.rmtree( tmp, ignore_errors = True )
+            return
+
+        self._count( "stored" )
+
+    def evict( self ):
+        """Remove least recently used entries until under the size limit"""
+        entries = []
+        total = 0
+        if not isdir( self.folder ):
+            return
+
+        for prefix in os.listdir( self.folder ):
+            prefixpath = join( self.folder, prefix )
+            if not isdir( prefixpath ):
+                continue
+
+            for key in os.listdir( prefixpath ):
+                path = join( prefixpath, key )
+                try:
+                    size = sum( [ os.path.getsize( join( path, x ) )
+                                  for x in os.listdir( path ) ] )
+                    entries.append( ( os.stat( path ).st_mtime, size, path ) )
+                except OSError:
+                    continue
+                total += size
+
+        entries.sort()
+        for mtime, size, path in entries: #IGNORE:W0612
+            if total <= self.maxsize:
+                break
+            shutil.rmtree( path, ignore_errors = True )
+            total -= size
+            self.evicted += 1
+
+    def summary( self ):
+        return "scons: %s cache: %d hits, %d misses, %d stored, %d evicted" % \
+                ( self.name, self.hits, self.misses, self.stored, self.evicted )
+
+def _finish():
+    for cache in CACHES.values():
+        if cache.stored > 0:
+            cache.evict()
+        if ARGS.CACHE_STATS and cache.hits + cache.misses > 0:
+            print cache.summary()
+
+atexit.register( _finish )
+
+def get_cache( name, folder, maxsize_mb ):
+    """Get cache instance by name. Created on first call."""
+    if name not in CACHES:
+        CACHES[name] = ArtifactCache( name, folder, maxsize_mb * 1024 * 1024 )
+    return CACHES[name]
+
+def _file_list( env, var ):
+    if var is None:
+        return []
+    return [ env.subst( x ) for x in SCons.Util.flatten( env.get( var, [] ) ) ]
+
+def CacheAction( cachename, comvar, inputsvar = None, outputsvar = None ):
+    """Create action running the command in construction variable comvar
+    through the cache.
+
+    @param cachename: Name of the cache in L{CACHES}.
+    @param comvar: Construction variable containing the command.
+    @param inputsvar: Construction variable listing additional input files
+                      read by the command, e.g. LIBS.
+    @param outputsvar: Construction variable listing additional output files
+                       written by the command, e.g. the linker map.
+    """
+    # NOTE: The closure must contain only plain values. SCons computes the
+    # action signature from them.
+    def cached( target, source, env ):
+        command = env.subst( "$" + comvar, 0, target, source )
+        outputs = [ x.abspath for x in target ] + _file_list( env, outputsvar )
+
+        # Paths inside the workspace must not prevent sharing between workspaces
+        command = command.replace( os.getcwd(), "#" )
+
+        h = hashlib.sha1()
+        h.update( " ".join( command.split() ) )
+        h.update( tool_digest( command.split()[0], env ) )
+        for path in [ x.abspath for x in source ] + _file_list( env, inputsvar ):
+            if isfile( path ):
+                h.update( file_digest( path ) )
+            else:
+                h.update( path )
+
+        return run_cached( cachename, h.hexdigest(), comvar, target, source, env, outputs )
+
+    return SCons.Action.Action( cached, strfunction = None, varlist = [ comvar ] )
+
+def run_cached( cachename, key, comvar, target, source, env, outputs ):
+    """Restore outputs from cache or run the command in comvar and store them.
+    @return: Exit status of the command.
+    """
+    cache = CACHES[cachename]
+    if cache.fetch( key, outputs ):
+        print "Retrieved `%s' from %s cache" % ( target[0], cache.name )
+        return 0
+
+    result = SCons.Action.Action( "$" + comvar )( target, source, env )
+    if not result:
+        cache.store( key, outputs )
+    return result
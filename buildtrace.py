@@ -0,0 +1,143 @@
+"""
+Build phase timing.
+
+Records start and stop times of the external tools and Python function
+actions per target and per job slot. The events are written at exit in
+Chrome trace-event format into the file given with trace=path.json.
+Open the file in chrome://tracing to see the critical path of the build.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import atexit
+import os
+import thread
+import threading
+import time
+
+#: Is the tracing enabled
+ENABLED = ARGS.TRACE_FILE is not None
+
+#: Build phases detected from the executable or script name.
+#: First match is used.
+PHASES = [ ( "makedef.pl", "makedef" ),
+           ( "elf2e32",    "elf2e32" ),
+           ( "rcomp",      "rcomp" ),
+           ( "cpp",        "preprocess" ),
+           ( "mifconv",    "mifconv" ),
+           ( "makesis",    "makesis" ),
+           ( "signsis",    "signsis" ),
+           ( "-ld",        "link" ),
+           ( "mwldsym2",   "link" ),
+           ( "-ar",        "archive" ),
+           ( "-gcc",       "compile" ),
+           ( "-g++",       "compile" ),
+           ( "distcc",     "compile" ),
+           ( "icecc",      "compile" ),
+           ( "mwccsym2",   "compile" ) ]
+
+_START = time.time()
+_EVENTS = []
+_SLOTS = {}
+_LOCK = threading.Lock()
+
+def _slot():
+    """Job slot of the current thread. SCons runs each job in own thread."""
+    ident = thread.get_ident()
+    _LOCK.acquire()
+    try:
+        return _SLOTS.setdefault( ident, len( _SLOTS ) )
+    finally:
+        _LOCK.release()
+
+def add_event( name, phase, start, end, **args ):
+    """Add complete event. Times are from time.time()."""
+    event = { "name" : name,
+              "cat"  : phase,
+              "ph"   : "X",
+              "ts"   : int( ( start - _START ) * 1000000 ),
+              "dur"  : int( ( end - start ) * 1000000 ),
+              "pid"  : os.getpid(),
+              "tid"  : _slot(),
+              "args" : args }
+    _LOCK.acquire()
+    try:
+        _EVENTS.append( event )
+    finally:
+        _LOCK.release()
+
+def command_phase( args ):
+    """Resolve the build phase of a command line"""
+    for arg in args:
+        name = os.path.basename( arg.replace( "\\", "/" ) ).lower()
+        if name in [ "wine", "perl", "-s" ]:
+            continue
+        for keyword, phase in PHASES:
+            if keyword in name:
+                return phase
+        break
+    return "other"
+
+def command_target( args ):
+    """Resolve the output of a command line"""
+    for i in xrange( len( args ) ):
+        arg = args[i]
+        if arg == "-o" and i + 1 < len( args ):
+            return args[i + 1]
+        for prefix in [ "--output=", "-o" ]:
+            if arg.startswith( prefix ) and len( arg ) > len( prefix ):
+                return arg[len( prefix ):].strip( '"' )
+    return " ".join( args[:1] )
+
+def add_command( args, start, end, result ):
+    """Add event for a spawned external process"""
+    add_event( os.path.basename( command_target( args ) ),
+               command_phase( args ),
+               start, end,
+               target = command_target( args ),
+               command = " ".join( args ),
+               result = result )
+
+def traced( phase ):
+    """Decorator for Python function actions.
+
+    The function is wrapped even if the tracing is disabled. SCons computes
+    the action signature from the function code, so enabling the tracing
+    must not change it and cause a rebuild.
+    """
+    def decorator( func ):
+        def action( *args, **kwargs ):
+            if not ENABLED:
+                return func( *args, **kwargs )
+
+            target = kwargs.get( "target", None )
+            if target is None:
+                name = func.__name__
+            else:
+                name = str( target[0] )
+
+            start = time.time()
+            try:
+                return func( *args, **kwargs )
+            finally:
+                add_event( os.path.basename( name ), phase, start, time.time(),
+                           target = name )
+
+        action.__name__ = func.__name__
+        action.__doc__  = func.__doc__
+        return action
+    return decorator
+
+def write( path ):
+    """Write the events in Chrome trace-event format"""
+    import json
+    f = open( path, "w" )
+    try:
+        json.dump( { "traceEvents" : _EVENTS,
+                     "displayTimeUnit" : "ms" }, f )
+    finally:
+        f.close()
+    print "scons: Build trace written to '%s'" % path
+
+if ENABLED:
+    atexit.register( lambda: write( ARGS.TRACE_FILE ) )
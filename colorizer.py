@@ -5,9 +5,17 @@ __author__ = "Jussi Toivola"
 __license__ = "MIT License"
 
 from SCons.Platform import win32, posix
+import buildtrace
+import config
+import diagnostics
 import os
 import subprocess as sp
 import sys
+import threading
+import time
+
+if os.name == "posix":
+    import select
 
 
 #: Pyreadline console
@@ -64,6 +72,65 @@ KEYWORDMAP = [ ( KEYWORD_WARNINGS, KEYWORD_WARNINGS_EXCLUDE, Colors.WARNING ),
                ( KEYWORD_ERRORS, KEYWORD_ERRORS_EXCLUDE, Colors.ERROR ),
                ( KEYWORD_COMMENT, KEYWORD_COMMENT_EXCLUDE, Colors.COMMENT ) ]
 
+#: Keyword tables by name for L{add_keywords}
+KEYWORD_TABLES = { "warning" : ( KEYWORD_WARNINGS, KEYWORD_WARNINGS_EXCLUDE ),
+                   "error"   : ( KEYWORD_ERRORS, KEYWORD_ERRORS_EXCLUDE ),
+                   "comment" : ( KEYWORD_COMMENT, KEYWORD_COMMENT_EXCLUDE ) }
+
+class KeywordMatcher( object ):
+    """Finds the color of a line from the keyword tables.
+
+    The first entry of the keyword map having a keyword and none of its
+    excluding keywords in the line gives the color. The tables are compiled
+    into tuples and the search stops at the first hit.
+
+    NOTE: Substring search is done in C, a combined regular expression was
+    measured slower with the re module. See tools/colorizer_benchmark.py.
+    """
+
+    def __init__( self, keywordmap ):
+        self.keywordmap = tuple( [ ( tuple( [ x.lower() for x in kws ] ),
+                                     tuple( [ x.lower() for x in excludes ] ),
+                                     color )
+                                   for ( kws, excludes, color ) in keywordmap ] )
+
+    def match( self, lowcase ):
+        """Get color of lowercase line.
+        @return: Color or Colors.NORMAL if no keywords are found.
+        """
+        for kws, excludes, color in self.keywordmap:
+            for kw in kws:
+                if kw in lowcase:
+                    for exclude in excludes:
+                        if exclude in lowcase:
+                            break
+                    else:
+                        return color
+                    break
+        return Colors.NORMAL
+
+#: Matcher for the KEYWORDMAP. Recompiled by L{add_keywords}.
+MATCHER = None
+
+def add_keywords( name, keywords, excludes = None ):
+    """Add keywords to the colorizer tables and recompile the matcher.
+
+    @param name: "warning", "error" or "comment"
+    @param keywords: Keywords coloring the line.
+    @param excludes: Keywords preventing the coloring.
+    """
+    global MATCHER
+    kws, excluded = KEYWORD_TABLES[name]
+    kws.extend( [ x.lower() for x in keywords ] )
+    excluded.extend( [ x.lower() for x in excludes or [] ] )
+    MATCHER = KeywordMatcher( KEYWORDMAP )
+
+MATCHER = KeywordMatcher( KEYWORDMAP )
+
+# userconfig can extend the tables with COLORIZER_KEYWORDS
+for __x in config.COLORIZER_KEYWORDS.items():
+    add_keywords( __x[0], *__x[1] )
+
 class LineCounts( object ):
     def __init__( self ):
         self.Errors = 0
@@ -76,12 +143,58 @@ class LineCounts( object ):
         self.Warnings = 0
         self.Others = 0
 
+    def add( self, records ):
+        """Count the diagnostics records"""
+        for record in records:
+            if record["severity"] == "error":
+                self.Errors += 1
+            else:
+                self.Warnings += 1
+
 LINECOUNTS = LineCounts()
 
 #: Original sys.stdout
 savedstdout = sys.stdout
 savedstderr = sys.stderr
 
+#: Held while writing a block of output, so that the output of parallel jobs
+#: is not interleaved.
+OUTPUT_LOCK = threading.RLock()
+
+#: Seconds to wait for output before checking if the process has exited.
+#: Only needed when a child of the process keeps the pipe open, like
+#: wineserver does.
+EXIT_CHECK_INTERVAL = 0.5
+
+def _read_output_posix( p ):
+    """Read output of the process until it exits.
+    @return: List of data blocks.
+    """
+    fd = p.stdout.fileno()
+    blocks = []
+    while True:
+        if select.select( [ fd ], [], [], EXIT_CHECK_INTERVAL )[0]:
+            block = os.read( fd, 65536 )
+            if block == "":
+                break
+            blocks.append( block )
+        elif p.poll() is not None:
+            # Exited, but the pipe is still open. The last output may have
+            # been written after the select timed out.
+            while select.select( [ fd ], [], [], 0 )[0]:
+                block = os.read( fd, 65536 )
+                if block == "":
+                    break
+                blocks.append( block )
+            break
+    return blocks
+
+def _read_output( p ):
+    """Read output of the process until the pipe is closed.
+    @return: List of lines.
+    """
+    return list( iter( p.stdout.readline, "" ) )
+
 def subsitute_env_vars( line, env ):
     """ Substitutes environment variables in the command line.
     
@@ -164,29 +277,43 @@ class ConsoleBase( object ):
 
     def write( self, text ):
         """Colorize each line based on the keywords"""
-        
+        OUTPUT_LOCK.acquire()
+        try:
+            self._write( text )
+        finally:
+            OUTPUT_LOCK.release()
+
+    def _write( self, text ):
+        """Colorize each line based on the keywords. Not locked."""
         lines = text.split( "\n" )
         
         for i in xrange( len( lines ) ):
             
             line = lines[i]
-            lowcase = line.lower()
-
-            detected = False
-            for kws, excludes, color in KEYWORDMAP:
-                # Check keywords and exclusion keywords
-                if  len( [x for x in kws if x in lowcase] ) > 0 \
-                and len( [x for x in excludes if x in lowcase] ) == 0:
-                    write( line, color )
-                    detected = True
-                    break
-
-            # Draw in normal color then
-            if not detected:
-                write( line, Colors.NORMAL )
+            write( line, MATCHER.match( line.lower() ) )
 
             if i < ( len( lines ) - 1 ):
                 write( "\n", Colors.NORMAL )
+
+def command_output( args, output, start, result ):
+    """Handle the output of an external command. The output is written
+    colored, its diagnostics are stored and the command is added to the
+    build trace. Used for the commands spawned by L{OutputConsole} and
+    the ones run in the wine shells of winesession.
+
+    @param args: Command line as a list.
+    @param output: Output of the command.
+    @param start: Start time of the command.
+    @param result: Exit status of the command.
+    """
+    if output != "":
+        # The OutputConsole colorizes the output
+        sys.stdout.write( output )
+        LINECOUNTS.add( diagnostics.add_output( args, output ) )
+
+    if buildtrace.ENABLED:
+        buildtrace.add_command( args, start, time.time(), result )
+
 class OutputConsole( ConsoleBase ):
     """Handles spawning external processes and colors the console output.
     """
@@ -223,35 +350,27 @@ class OutputConsole( ConsoleBase ):
             startupinfo = sp.STARTUPINFO()
             startupinfo.dwFlags |= sp.STARTF_USESHOWWINDOW
         
-        stdout = sp.PIPE
-        #import pdb;pdb.set_trace()
-        if ( os.name == "posix" and args[0] == "wine" ):
-            stdout = None
-            
         # We get unicode objects in the environment from somewhere, which makes
         # Popen unhappy. Force the environment to strings.
         # TODO(mika.raento): fix the source of the unicode.
         env = dict([ (k, str(v)) for (k, v) in env.iteritems() ])
 
-        p = sp.Popen( args, bufsize = 1024,
-                    stdout = stdout, stderr = sp.STDOUT,
+        start = time.time()
+        p = sp.Popen( args,
+                    stdout = sp.PIPE, stderr = sp.STDOUT,
                     startupinfo = startupinfo,
                     shell = False, env = env )
-        result = None
-        #import pdb;pdb.set_trace()
-        if p.stdout is not None:
-            while result is None:
-                # This is slow on Linux with Wine!!
-                line = p.stdout.read()
-                self.write( line )
-                result = p.poll()
-            # Get the last lines            
-            line = p.stdout.readline()
-            self.write( line )
-            
+
+        # The output is buffered per job and written at once when the
+        # process exits to keep the output of parallel jobs readable.
+        if os.name == "posix":
+            output = _read_output_posix( p )
         else:
-            result = p.wait()
-            
+            output = _read_output( p )
+        p.stdout.close()
+        result = p.wait()
+
+        command_output( args, "".join( output ), start, result )
         return result
         
 del __x
@@ -9,7 +9,10 @@ __username = "USERNAME" #IGNORE:W006
 if sys.platform == "linux2":
     __username = "USER" #IGNORE:W6
 
-__userconfig = join( dirname( __file__ ), os.environ[__username], "userconfig.py" ) #IGNORE:W6
+#: Folder for the user's configuration and persistent caches
+USERCONFIG_FOLDER = join( dirname( __file__ ), os.environ[__username] ) #IGNORE:W6
+
+__userconfig = join( USERCONFIG_FOLDER, "userconfig.py" ) #IGNORE:W6
 if exists( __userconfig  ):
     sys.path.append( dirname( __userconfig ) )
     from userconfig import * #IGNORE:W14
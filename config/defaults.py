@@ -25,6 +25,11 @@ DO_CREATE_SIS = False
 GCCE_OPTIMIZATION_FLAGS = ""
 WINSCW_OPTIMIZATION_FLAGS = ""
 
+#: Extra keywords for the console colorizer by table name. The value is
+#: ( keywords, excluding keywords ), e.g. { "error" : ( [ "fatal" ], [] ) }.
+#: Tables: "warning", "error" and "comment".
+COLORIZER_KEYWORDS = {}
+
 if os.name == "posix":    
     EPOCROOT = ""
     COMPILER = COMPILER_GCCE
\ No newline at end of file
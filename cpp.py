@@ -5,19 +5,26 @@ __author__    = "Jussi Toivola"
 __license__   = "MIT License"
 
 from os.path import abspath
+import arguments as ARGS
 import os
+import rscscan
 import sys
+import winesession
 
 CPP = os.environ["EPOCROOT"] + os.path.join( "epoc32", "gcc", "bin", "cpp" )
 
 if sys.platform == "linux2":
-    CPP = "wine " + CPP + ".exe"
+    CPP = CPP + ".exe"
+
+#: Preprocessor of the host used with resourcecpp=host
+HOST_CPP = "cpp"
 
 def Preprocess( env, target, source, includes, fileinc, defines ):
     """Utility for creating Command for preprocessor"""
     handle_path = abspath
+    use_wine = winesession.ENABLED and ARGS.RESOURCE_CPP == "sdk"
     
-    if sys.platform == "linux2":
+    if use_wine:
         # Use relative on linux
         
         def h( x ):
@@ -32,8 +39,7 @@ def Preprocess( env, target, source, includes, fileinc, defines ):
         handle_path = h
     
     # This is strange... On windows it seems that include paths must be absolute and relative on linux
-    cmd=[
-            CPP,
+    args=[
             "-undef -C -I-",
             "-I",
             " -I ".join( [ handle_path(x) for x in includes ]  ),
@@ -44,9 +50,27 @@ def Preprocess( env, target, source, includes, fileinc, defines ):
             " -include",
             " -include ".join( [ handle_path(x) for x in fileinc ] )
         ]
-    cmd = " ".join( cmd )
+    args = " ".join( args )
     
-    return env.Command( target, source, cmd )
-
-
+    if ARGS.RESOURCE_CPP == "host":
+        # No system headers of the host. Input is C regardless of the extension.
+        action = " ".join( [ HOST_CPP, "-nostdinc -x c", args ] )
+    elif use_wine and ARGS.WINE_BATCH:
+        # Run in a wine shell. The output is colored and traced like the
+        # output of the spawned commands.
+        def build( target, source, env ):
+            return winesession.run( CPP, args )
+        action = env.Action( build, " ".join( [ CPP, args ] ) )
+    elif use_wine:
+        # Spawned by SCons after starting the persistent wineserver
+        action = [ winesession.START_SERVER, " ".join( [ "wine", CPP, args ] ) ]
+    else:
+        action = " ".join( [ CPP, args ] )
+    
+    # Included headers are found from the include paths given to cpp
+    result = env.Command( target, source, action,
+                          source_scanner = rscscan.SCANNER,
+                          RSCPATH = [ abspath( x ) for x in includes ] )
+    env.Depends( result, [ abspath( x ) for x in fileinc ] )
+    return result
 
@@ -0,0 +1,198 @@
+"""
+Structured compiler diagnostics.
+
+Warnings and errors in the output of the spawned tools are parsed from the
+GCC message format, which is also used by mwccsym2 with -msgstyle gcc:
+
+    src/engine.cpp:12: warning: unused variable 'x'
+    src/engine.cpp:12:5: error: 'x' was not declared in this scope
+
+With diagnostics=path.jsonl the records are appended to the file as JSON
+lines while the build runs and the summary at the end of the build is read
+from it. The files of two builds can be compared with
+tools/diagnostics_diff.py.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import atexit
+import buildtrace
+import os
+import re
+import threading
+
+#: Is the diagnostics store enabled
+ENABLED = ARGS.DIAGNOSTICS_FILE is not None
+
+#: GCC style diagnostic. The file can start with a drive letter.
+DIAGNOSTIC_RE = re.compile( r"^(?P<file>(?:[A-Za-z]:)?[^:]+):(?P<line>\d+):(?:(?P<column>\d+):)?"
+                            r"\s*(?P<severity>warning|error|fatal error):\s*(?P<message>.*?)\s*$" )
+
+#: Option of the warning given by newer GCC, e.g. [-Wunused-variable]
+OPTION_RE = re.compile( r"\s*\[(-W[^\]]+)\]$" )
+
+#: Quoted names and numbers are left out of the warning class
+QUOTED_RE = re.compile( r"(`[^']*'|'[^']*'|\"[^\"]*\")" )
+NUMBER_RE = re.compile( r"\b\d+\b" )
+
+#: Number of the most common classes and files in the summary
+SUMMARY_SIZE = 10
+
+_LOCK = threading.Lock()
+_STORE = None
+
+def warning_class( message ):
+    """Get class of the diagnostic from its message.
+
+    The -W option is used if given by the compiler. Otherwise the quoted
+    names and numbers are replaced to group the messages.
+    """
+    m = OPTION_RE.search( message )
+    if m is not None:
+        return m.group( 1 )
+    message = QUOTED_RE.sub( "'*'", message )
+    return NUMBER_RE.sub( "N", message )
+
+def output_component( target ):
+    """Get the component of an output path in the build folder.
+
+    Outputs are in build<version>/<compiler>_<release>/<target>_<targettype>.
+    @return: Component folder name or the target itself.
+    """
+    parts = os.path.abspath( target ).replace( "\\", "/" ).split( "/" )
+    for i in xrange( len( parts ) - 2 ):
+        if parts[i].startswith( "build" ) and "_" in parts[i + 1]:
+            return parts[i + 2]
+    return target
+
+def parse( output, target ):
+    """Parse the diagnostics from the output of a tool.
+
+    @param output: Output of the tool.
+    @param target: Output file of the tool.
+    @return: List of records as dictionaries.
+    """
+    records = []
+    if "warning" not in output and "error" not in output:
+        return records
+
+    component = output_component( target )
+    for line in output.split( "\n" ):
+        m = DIAGNOSTIC_RE.match( line )
+        if m is None:
+            continue
+
+        column = m.group( "column" )
+        if column is not None:
+            column = int( column )
+
+        severity = m.group( "severity" )
+        if severity == "fatal error":
+            severity = "error"
+
+        records.append( { "target"    : target,
+                          "component" : component,
+                          "file"      : m.group( "file" ).replace( "\\", "/" ),
+                          "line"      : int( m.group( "line" ) ),
+                          "column"    : column,
+                          "severity"  : severity,
+                          "class"     : warning_class( m.group( "message" ) ),
+                          "message"   : m.group( "message" ) } )
+    return records
+
+def add_output( args, output ):
+    """Parse the output of a spawned command and store the diagnostics.
+    @return: List of records.
+    """
+    records = parse( output, buildtrace.command_target( args ) )
+    if ENABLED and records:
+        _write( records )
+    return records
+
+def report( target, path, line, severity, message ):
+    """Store a diagnostic found by the build scripts themselves.
+    @return: The record.
+    """
+    record = { "target"    : target,
+               "component" : output_component( target ),
+               "file"      : path.replace( "\\", "/" ),
+               "line"      : line,
+               "column"    : None,
+               "severity"  : severity,
+               "class"     : warning_class( message ),
+               "message"   : message }
+    if ENABLED:
+        _write( [ record ] )
+    return record
+
+def _open():
+    """Open the store. Records of the previous build are replaced."""
+    global _STORE
+    folder = os.path.dirname( os.path.abspath( ARGS.DIAGNOSTICS_FILE ) )
+    if not os.path.exists( folder ):
+        os.makedirs( folder )
+    _STORE = open( ARGS.DIAGNOSTICS_FILE, "w" )
+
+def _write( records ):
+    """Append records to the store"""
+    import json
+    _LOCK.acquire()
+    try:
+        for record in records:
+            _STORE.write( json.dumps( record, sort_keys = True ) + "\n" )
+        _STORE.flush()
+    finally:
+        _LOCK.release()
+
+def load( path ):
+    """Read records from a store
+    @return: List of records.
+    """
+    import json
+    f = open( path )
+    try:
+        return [ json.loads( x ) for x in f if x.strip() ]
+    finally:
+        f.close()
+
+def count( records, key ):
+    """Count records by the value of key
+    @return: List of ( count, value ) sorted by the count, most common first.
+    """
+    counts = {}
+    for record in records:
+        value = record[key]
+        counts[value] = counts.get( value, 0 ) + 1
+    result = [ ( x[1], x[0] ) for x in counts.items() ]
+    result.sort( key = lambda x: ( -x[0], x[1] ) )
+    return result
+
+def summary( records ):
+    """Format the end of build summary"""
+    warnings = [ x for x in records if x["severity"] == "warning" ]
+    errors   = [ x for x in records if x["severity"] == "error" ]
+
+    lines = [ "scons: %d warnings, %d errors" % ( len( warnings ), len( errors ) ) ]
+    for title, key in [ ( "component", "component" ),
+                        ( "file", "file" ),
+                        ( "warning class", "class" ) ]:
+        counts = count( warnings, key )
+        if not counts:
+            continue
+        lines.append( "scons: Warnings by %s:" % title )
+        for n, value in counts[:SUMMARY_SIZE]:
+            lines.append( "  %6d  %s" % ( n, value ) )
+    return "\n".join( lines )
+
+def _finish():
+    global _STORE
+    if _STORE is None:
+        return
+    _STORE.close()
+    _STORE = None
+    print summary( load( ARGS.DIAGNOSTICS_FILE ) )
+    print "scons: Diagnostics written to '%s'" % ARGS.DIAGNOSTICS_FILE
+
+if ENABLED:
+    _open()
+    atexit.register( _finish )
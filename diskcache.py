@@ -0,0 +1,58 @@
+"""
+Small persistent caches stored next to the user configuration.
+
+Used for values which are slow to find out but rarely change between
+builds, such as the SDK version and the include scanner results.
+Every failure to read or write a cache is silently ignored, the caller
+is expected to fall back to the slow path.
+"""
+__license__ = "MIT License"
+
+from config import USERCONFIG_FOLDER
+from os.path import join, exists
+import cPickle
+import os
+
+def _cachepath( name ):
+    return join( USERCONFIG_FOLDER, "%s.cache" % name )
+
+def load( name ):
+    """Read cache dictionary 'name'. Returns empty dict if not available."""
+    try:
+        f = open( _cachepath( name ), "rb" )
+        try:
+            data = cPickle.load( f )
+        finally:
+            f.close()
+    except Exception: #IGNORE:W0703 Missing or corrupted cache
+        return {}
+
+    if type( data ) != dict:
+        return {}
+    return data
+
+def save( name, data ):
+    """Write cache dictionary 'name'. The old cache is replaced atomically
+    so that parallel builds never see a partially written file.
+    """
+    path = _cachepath( name )
+    tmppath = "%s.%d" % ( path, os.getpid() )
+    try:
+        if not exists( USERCONFIG_FOLDER ):
+            os.makedirs( USERCONFIG_FOLDER )
+
+        f = open( tmppath, "wb" )
+        try:
+            cPickle.dump( data, f, cPickle.HIGHEST_PROTOCOL )
+        finally:
+            f.close()
+
+        if os.name == "nt" and exists( path ):
+            # rename does not overwrite on Windows
+            os.remove( path )
+        os.rename( tmppath, path )
+    except ( IOError, OSError ):
+        try:
+            os.remove( tmppath )
+        except OSError: #IGNORE:W0704
+            pass
@@ -0,0 +1,161 @@
+"""
+Distributed compilation of GCCE sources with distcc or icecc.
+
+Enable with distcc=distcc or distcc=icecc. distcc is selected by default
+when DISTCC_HOSTS is set. The launcher is put in front of the compile
+commands, the compiler itself stays arm-none-symbianelf-gcc/g++.
+
+distcc runs the compiler locally if it sees -x, so the language is not
+given with -x in distributed mode. The sources are compiled by the gcc
+driver for C and by the g++ driver for C++, which select the same language
+from the source suffix.
+
+The number of parallel jobs is set to the sum of the host slots unless -j
+or distcc_jobs=N is given. See distcc/README.txt for a local test setup.
+"""
+__license__ = "MIT License"
+
+from SCons.Script import GetOption, SetOption
+from echoutil import loginfo
+import arguments as ARGS
+import os
+import subprocess as sp
+import sys
+
+#: distcc, icecc or none
+MODE = ARGS.DISTCC
+
+#: Is distributed compilation enabled
+ENABLED = MODE != "none"
+
+#: Old Cygwin distcc on Windows. Uses the wrappers in distcc folder.
+CYGWIN_WRAPPER = ENABLED and MODE == "distcc" and sys.platform == "win32"
+
+#: Default slots of a distcc host without /LIMIT
+DEFAULT_SLOTS = 4
+#: Default slots of localhost without /LIMIT
+DEFAULT_LOCAL_SLOTS = 2
+
+def language_flag( lang ):
+    """Get flag forcing the source language.
+
+    @param lang: "c" or "c++"
+    @return: "-x <lang>" or empty in distributed mode.
+    """
+    if ENABLED:
+        return ""
+    return "-x %s" % lang
+
+def product_include_define( header ):
+    """Get __PRODUCT_INCLUDE__ define for the platform header.
+
+    The header is given as quoted string, which is included as such by
+    gcce.h. distcc and icecc preprocess locally and remote compilers get the
+    preprocessed source, so the same form works for both. Only the Cygwin
+    wrapper needs the unquoted form and the gcce.h change in distcc/README.txt.
+    """
+    header = header.replace( "\\", "/" )
+    if CYGWIN_WRAPPER:
+        return ( "__PRODUCT_INCLUDE__", header )
+    return ( "__PRODUCT_INCLUDE__", r'\"%s\"' % header )
+
+def install( env ):
+    """Compile the sources of env with the distributed compiler.
+    Nothing is done if disabled.
+    """
+    if not ENABLED:
+        return
+
+    if CYGWIN_WRAPPER:
+        env["CC"]  = r'\cygwin\bin\distcc.exe arm-none-symbianelf-gcc.wrapper'
+        env["CXX"] = r'\cygwin\bin\distcc.exe arm-none-symbianelf-g++.wrapper'
+        return
+
+    # Launcher is kept out of CC and CXX, so that the preprocessor
+    # commands of the object cache are run locally with the plain compiler.
+    env["DISTCC"] = MODE
+    env["CCCOM"]  = "$DISTCC " + env["CCCOM"]
+    env["CXXCOM"] = "$DISTCC " + env["CXXCOM"]
+
+def parse_hosts( hosts ):
+    """Compute the number of slots from distcc host specification.
+
+    Host is given as [@]HOST[:PORT][/LIMIT][,OPTIONS]. Options like
+    --randomize and --localslots are ignored.
+    @return: Sum of the host slots.
+    """
+    slots = 0
+    for host in hosts.split():
+        if host.startswith( "-" ) or host.startswith( "+" ):
+            # Options and +zeroconf
+            continue
+
+        host = host.split( "," )[0]
+        if "/" in host:
+            host, limit = host.split( "/", 1 )
+            try:
+                slots += int( limit )
+                continue
+            except ValueError:
+                pass
+
+        if host.lstrip( "@" ).split( ":" )[0] == "localhost":
+            slots += DEFAULT_LOCAL_SLOTS
+        else:
+            slots += DEFAULT_SLOTS
+    return slots
+
+def host_slots():
+    """Get the number of compile slots advertised by the distcc hosts.
+
+    'distcc --show-hosts' resolves the hosts file and zeroconf, DISTCC_HOSTS
+    is used if it fails. icecc does not advertise the hosts to the clients.
+    @return: Number of slots or None if not known.
+    """
+    if MODE != "distcc":
+        return None
+
+    hosts = None
+    try:
+        p = sp.Popen( [ "distcc", "--show-hosts" ], stdout = sp.PIPE, stderr = sp.PIPE )
+        output = p.communicate()[0]
+        if p.returncode == 0:
+            hosts = output
+    except OSError:
+        pass
+
+    if hosts is None:
+        hosts = os.environ.get( "DISTCC_HOSTS", "" )
+
+    slots = parse_hosts( hosts )
+    if slots == 0:
+        return None
+    return slots
+
+def _jobs_given():
+    """Check if -j was given on the command line"""
+    for arg in sys.argv[1:]:
+        if arg.startswith( "-j" ) or arg.startswith( "--jobs" ):
+            return True
+    return False
+
+def scale_jobs():
+    """Set the number of parallel jobs to the available slots.
+    @return: Number of jobs set or None if left unchanged.
+    """
+    if not ENABLED or ARGS.HELP_ENABLED:
+        return None
+
+    if ARGS.DISTCC_JOBS is not None:
+        jobs = int( ARGS.DISTCC_JOBS )
+    elif _jobs_given():
+        return None
+    else:
+        jobs = host_slots()
+
+    if jobs is None or jobs == GetOption( "num_jobs" ):
+        return None
+
+    SetOption( "num_jobs", jobs )
+    loginfo( "%s: using %d parallel jobs" % ( MODE, jobs ) )
+    return jobs
@@ -14,4 +14,7 @@ def sysout(*args):
     sys.stdout.write( os.linesep )
 
 def loginfo(*args):
-    sysout( "Info:", *args)
\ No newline at end of file
+    sysout( "Info:", *args)
+
+def logwarning(*args):
+    sysout( "Warning:", *args)
\ No newline at end of file
@@ -12,15 +12,17 @@ from SCons.Builder import Builder
 from SCons.Environment import Environment
 from arguments import * #IGNORE:W0611
 import arguments as ARGS
+import artifactcache
+import distcompile
+import objectcache
+import pch
 from os import path
 from os.path import join
 import os
 import textwrap
 
-USE_DISTCC = False
-if "DISTCC_HOSTS" in os.environ:
-  if os.environ["DISTCC_HOSTS"] != "":
-    USE_DISTCC= True
+USE_DISTCC = distcompile.ENABLED
+distcompile.scale_jobs()
 
 DEFAULT_GCCE_DEFINES = DEFAULT_SYMBIAN_DEFINES[:]
 DEFAULT_GCCE_DEFINES += [
@@ -29,9 +31,7 @@ DEFAULT_GCCE_DEFINES += [
                         "__MARM__",
                         "__EABI__",
                         "__MARM_ARMV5__",
-                        ( "__PRODUCT_INCLUDE__", r'%s' % PLATFORM_HEADER.replace("\\", "/") )
-                          if USE_DISTCC else
-                        ( "__PRODUCT_INCLUDE__", r'\"%s\"' % PLATFORM_HEADER.replace("\\", "/") )
+                        distcompile.product_include_define( PLATFORM_HEADER )
                         ]
 
 SYMBIAN_ARMV5_LIBPATH = [ EPOCROOT ] + "epoc32 release armv5".split()
@@ -48,10 +48,44 @@ WARNINGS_C = "-Wall -Wno-unknown-pragmas -fexceptions " \
             "-march=armv5t -mapcs -pipe -nostdinc -msoft-float"
 WARNINGS_CXX = WARNINGS_C + " -Wno-ctor-dtor-privacy"
 
+def _compile_flags( warnings, gcce_options, lang, compiler_include ):
+    """Compiler flags for C or C++ sources including the forced header"""
+    return " ".join( [ warnings, gcce_options, distcompile.language_flag( lang ),
+                       "-include", compiler_include ] )
+
 
 #: Environment cache
 _GCCE_ENV = None
 
+def _use_pch( env, gcce_options, sysincludes, common_defines, compiler_include ):
+    """Include precompiled gcce.h instead of the plain header.
+
+    gcc uses <header>.gch found next to the included header, so a wrapper
+    header is written per key and precompiled beside it. The header is
+    compiled with the common defines only. gcc checks that the defines of
+    the component do not change the header and falls back to the plain
+    wrapper if they do.
+    """
+    for lang, compiler, flagsvar, warnings, nodevar in [
+            ( "c",   "$CC",  "CFLAGS",   WARNINGS_C,   "PCH_C" ),
+            ( "c++", "$CXX", "CXXFLAGS", WARNINGS_CXX, "PCH_CXX" ) ]:
+        flags = warnings + " " + gcce_options
+        key = pch.digest( COMPILER, RELEASE, lang, env.subst( compiler ),
+                          flags, common_defines, sysincludes )
+        header = join( pch.get_folder( key ), "s4s_gcce.h" )
+        content = '#include "%s"\n' % compiler_include.replace( "\\", "/" )
+
+        command = "%s %s -x %s-header $_CPPDEFFLAGS $_CPPINCFLAGS -o $TARGET $SOURCE" % \
+                  ( compiler, flags, lang )
+        # gcce.h includes the platform header through __PRODUCT_INCLUDE__,
+        # which the scanner does not follow, so it is scanned separately.
+        node = pch.get_node( env, key, header + ".gch", header, content, command,
+                             scanned = [ PLATFORM_HEADER ],
+                             CPPPATH = sysincludes, CPPDEFINES = common_defines )
+
+        env[flagsvar] = env[flagsvar].replace( compiler_include, header )
+        env[nodevar] = node
+
 def create_environment( target,
                         targettype,
                         includes,
@@ -94,14 +128,17 @@ def create_environment( target,
       else:
         gcce_options = '-O0 -g'
 
+    # Shared by the components, the precompiled header is built with these
+    common_defines = []
     if targettype != TARGETTYPE_LIB:
         if targettype in DLL_TARGETTYPES:
-            defines.append( "__DLL__" )
+            common_defines.append( "__DLL__" )
         else:
-            defines.append( "__EXE__" )
+            common_defines.append( "__EXE__" )
 
-    defines.extend( DEFAULT_GCCE_DEFINES )
-    defines.extend( CMD_LINE_DEFINES )
+    common_defines.extend( DEFAULT_GCCE_DEFINES )
+    common_defines.extend( CMD_LINE_DEFINES )
+    defines.extend( common_defines )
 
     LIBARGS = [ "-lsupc++", "-lgcc" ]
     LIBPATH = SYMBIAN_ARMV5_LIBPATHDSO
@@ -262,22 +299,10 @@ def create_environment( target,
                     LIBPREFIX = "",
 
                     # Compiler settings
-
-                    CC = (r'\cygwin\bin\distcc.exe arm-none-symbianelf-gcc.wrapper')
-                           if USE_DISTCC else
-                         (r'arm-none-symbianelf-gcc'),
-
-                    CFLAGS = (WARNINGS_C + " " + gcce_options + " -include " + COMPILER_INCLUDE)
-                             if USE_DISTCC else
-                             (WARNINGS_C + " " + gcce_options + " -x c -include " + COMPILER_INCLUDE),
-
-                    CXX = (r'\cygwin\bin\distcc.exe arm-none-symbianelf-g++.wrapper')
-                            if USE_DISTCC else                    
-                          (r'arm-none-symbianelf-g++'),
-
-                    CXXFLAGS = (WARNINGS_CXX + " " + gcce_options + " -include %s " % ( COMPILER_INCLUDE ))
-                                 if USE_DISTCC else
-                               (WARNINGS_CXX + " " + gcce_options + " -x c++ -include %s " % ( COMPILER_INCLUDE )),
+                    CC = r'arm-none-symbianelf-gcc',
+                    CFLAGS = _compile_flags( WARNINGS_C, gcce_options, "c", COMPILER_INCLUDE ),
+                    CXX = r'arm-none-symbianelf-g++',
+                    CXXFLAGS = _compile_flags( WARNINGS_CXX, gcce_options, "c++", COMPILER_INCLUDE ),
 
                     # isystem does not work so just adding the system include paths before normal includes.
                     CPPPATH = sysincludes + includes,
@@ -296,6 +321,15 @@ def create_environment( target,
                     LIBLINKPREFIX = " ",
                     PROGSUFFIX = ".noelfexe"
                 )
+        if ARGS.ARTIFACT_CACHE is not None:
+            artifactcache.get_cache( "artifact", ARGS.ARTIFACT_CACHE, ARGS.ARTIFACT_CACHE_SIZE )
+            _GCCE_ENV["ARTIFACT_LINKCOM"] = _GCCE_ENV["LINKCOM"]
+            _GCCE_ENV["LINKCOM"] = artifactcache.CacheAction( "artifact", "ARTIFACT_LINKCOM",
+                                                              "LIBS", "LINK_OUTPUTS" )
+        distcompile.install( _GCCE_ENV )
+        objectcache.install( _GCCE_ENV )
+        if ARGS.PCH_ENABLED:
+            pch.install_emitters( _GCCE_ENV )
         env = _GCCE_ENV
     else:
         # A lot faster than creating the environment from scratch
@@ -304,13 +338,8 @@ def create_environment( target,
     env.Replace(
         ENV = os.environ,
 
-        CFLAGS = (WARNINGS_C + " " + gcce_options + " -include " + COMPILER_INCLUDE)
-                   if USE_DISTCC else
-                 (WARNINGS_C + " " + gcce_options + " -x c -include " + COMPILER_INCLUDE),
-
-        CXXFLAGS = (WARNINGS_CXX + " " + gcce_options + " -include %s " % ( COMPILER_INCLUDE ))
-                     if USE_DISTCC else
-                   (WARNINGS_CXX + " " + gcce_options + " -x c++ -include %s " % ( COMPILER_INCLUDE )),
+        CFLAGS = _compile_flags( WARNINGS_C, gcce_options, "c", COMPILER_INCLUDE ),
+        CXXFLAGS = _compile_flags( WARNINGS_CXX, gcce_options, "c++", COMPILER_INCLUDE ),
 
         # isystem does not work so just adding the system include paths before normal includes.
         CPPPATH = sysincludes + includes,
@@ -319,8 +348,14 @@ def create_environment( target,
         # Linker settings
         LINKFLAGS = LINKFLAGS,
         LIBS = libraries,
+        LINK_OUTPUTS = [ "%s/epoc32/release/gcce/%s/%s.%s.map" % ( ARGS.INSTALL_EPOCROOT, ARGS.RELEASE,
+                                                                    target, targettype ) ],
     )
 
+    # distcc preprocesses locally and compiles remotely without the precompiled header
+    if ARGS.PCH_ENABLED and not USE_DISTCC:
+        _use_pch( env, gcce_options, sysincludes, common_defines, COMPILER_INCLUDE )
+
 
     # Add GCC binaries to path head, so we are sure to use them instead of some other (Cygwin, Carbide)
     # TODO: Windows specific
@@ -347,7 +382,18 @@ def create_environment( target,
                           "SID"         : sid,
                           "DEFCONFIG"   : defconfig }
 
-    elf2e32_builder = Builder( action = elf2e32_cmd.replace( "\\", "/" ),
+    env["ELF2E32COM"] = elf2e32_cmd.replace( "\\", "/" )
+    elf2e32_action = "$ELF2E32COM"
+    if ARGS.ARTIFACT_CACHE is not None:
+        # elf2e32 also reads the frozen .def and writes the unfrozen one
+        env["ELF2E32_INPUTS"] = [ x for x in [ definput ] if x is not None ]
+        env["ELF2E32_OUTPUTS"] = []
+        if targettype in DLL_TARGETTYPES:
+            env["ELF2E32_OUTPUTS"] = [ defoutput ]
+        elf2e32_action = artifactcache.CacheAction( "artifact", "ELF2E32COM",
+                                                    "ELF2E32_INPUTS", "ELF2E32_OUTPUTS" )
+
+    elf2e32_builder = Builder( action = elf2e32_action,
                        src_suffix = ".noelfexe",
                        suffix = "." + targettype,
                        single_source = True,
@@ -0,0 +1,72 @@
+"""
+Lazy loading of S4S subsystems.
+
+The subsystems are imported only when the SConstruct first uses them. This
+keeps 'scons -h' and builds with nothing to do from loading the compiler
+environments, packaging and resource tools.
+
+Use command line option --s4s-import-profile to print the import times.
+"""
+__license__ = "MIT License"
+
+import atexit
+import sys
+import time
+
+#: Print the import times at exit
+PROFILE_ENABLED = "--s4s-import-profile" in sys.argv
+
+#: List of ( module name, seconds ) in import order
+IMPORT_TIMES = []
+
+def record( name, seconds ):
+    """Record import time of a module"""
+    IMPORT_TIMES.append( ( name, seconds ) )
+
+def timed_import( name ):
+    """Import module relative to the S4S package and record the time used."""
+    start = time.time()
+    module = __import__( name, globals(), locals(), [] )
+    record( name, time.time() - start )
+    return module
+
+class LazyProxy( object ):
+    """Creates the proxied object on the first attribute access"""
+
+    def __init__( self, factory ):
+        self.__dict__["_factory"] = factory
+        self.__dict__["_target"] = None
+
+    def _get_target( self ):
+        target = self.__dict__["_target"]
+        if target is None:
+            target = self.__dict__["_factory"]()
+            self.__dict__["_target"] = target
+        return target
+
+    def __getattr__( self, name ):
+        return getattr( self._get_target(), name )
+
+    def __setattr__( self, name, value ):
+        setattr( self._get_target(), name, value )
+
+class LazyModule( LazyProxy ):
+    """Imports the module on the first attribute access"""
+
+    def __init__( self, name ):
+        LazyProxy.__init__( self, lambda: timed_import( name ) )
+        self.__dict__["_name"] = name
+
+    def __repr__( self ):
+        return "<lazy module '%s'>" % self.__dict__["_name"]
+
+def _print_profile():
+    if len( IMPORT_TIMES ) == 0:
+        return
+
+    print "S4S import times:"
+    for name, seconds in IMPORT_TIMES:
+        print "  %-20s %6.3fs" % ( name, seconds )
+
+if PROFILE_ENABLED:
+    atexit.register( _print_profile )
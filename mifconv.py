@@ -0,0 +1,164 @@
+"""
+Isolated mifconv runs.
+
+mifconv and the converters it starts write intermediate files into the
+temp folder, the working folder and next to the source icons. Each run
+therefore gets a private working folder, which is also used as the temp
+folder, and copies of the source icons. The results are moved into place
+when the conversion has succeeded. The icons of different targets can be
+converted in parallel.
+
+The results are cached by the contents and order of the icons, the color
+depth flags and the digest of the mifconv binary. On a hit mifconv is not
+run at all. See mifcache=<folder>.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import artifactcache
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess as sp
+import tempfile
+
+#: Color depth flags of the icons
+ICON_FLAGS = "/c32,1"
+
+#: Name of the cache in artifactcache.CACHES
+CACHE_NAME = "mif"
+
+def join_relative( *parts ):
+    """Join path with forward slashes, mifconv handles them on all hosts"""
+    return "/".join( parts )
+
+def absolute_command( cmd ):
+    """Make the paths in the command absolute, so that it can be run from
+    the private working folder. The command can also be a wrapper with
+    arguments, such as wine tools/mifconv.exe. The first word is made
+    absolute if it exists, the other words if they are existing paths.
+    A name found from PATH is left as is.
+    """
+    words = []
+    for index, word in enumerate( shlex.split( cmd, posix = False ) ):
+        path = word.strip( '"' )
+        is_path = index == 0 or "/" in path or "\\" in path
+        if is_path and os.path.exists( path ) and not os.path.isabs( path ):
+            word = '"%s"' % os.path.abspath( path ).replace( "\\", "/" )
+        words.append( word )
+    return " ".join( words )
+
+def _stage_icons( workdir, icons ):
+    """Copy icons into the working folder. mifconv names the bitmap
+    enumerations after the files, so the names are kept.
+    @return: Paths of the copies relative to the working folder.
+    """
+    staged = []
+    for index in xrange( len( icons ) ):
+        folder = join_relative( "icons", str( index ) )
+        os.makedirs( os.path.join( workdir, folder ) )
+        name = join_relative( folder, os.path.basename( icons[index] ) )
+        shutil.copyfile( icons[index], os.path.join( workdir, name ) )
+        staged.append( name )
+    return staged
+
+def _move( source, target ):
+    """Move file into place replacing existing file"""
+    folder = os.path.dirname( target )
+    if not os.path.isdir( folder ):
+        os.makedirs( folder )
+    # Rename does not replace existing file on Windows
+    if os.name == "nt" and os.path.exists( target ):
+        os.remove( target )
+    # Renamed if on the same file system
+    shutil.move( source, target )
+
+def _cache():
+    if ARGS.MIF_CACHE is None:
+        return None
+    return artifactcache.get_cache( CACHE_NAME, ARGS.MIF_CACHE, ARGS.MIF_CACHE_SIZE )
+
+def cache_key( mifconv, miffile, mbgfile, icons, env ):
+    """Compute the cache key of a conversion.
+
+    The names of the icons and the header are included, because the
+    enumerations in the header are named after them.
+    """
+    h = hashlib.sha1()
+    # Covers both the wrapper and the tool it runs
+    for word in shlex.split( mifconv, posix = False ):
+        h.update( "\0%s" % artifactcache.tool_digest( word, env ) )
+    h.update( ICON_FLAGS )
+    h.update( os.path.basename( miffile ) )
+    h.update( "\0%s" % ( mbgfile and os.path.basename( mbgfile ) ) )
+    for icon in icons:
+        h.update( "\0%s\0" % os.path.basename( icon ) )
+        h.update( artifactcache.file_digest( icon ) )
+    return h.hexdigest()
+
+def convert( mifconv, miffile, mbgfile, icons, env ):
+    """Convert the icons, restoring the results from the cache if possible.
+
+    @param mifconv: mifconv command.
+    @param miffile: Path to the resulting .mif file.
+    @param mbgfile: Path to the resulting .mbg header or None.
+    @param icons: Paths to the source icons in order.
+    @param env: SCons environment.
+    @return: Exit status of mifconv.
+    """
+    outputs = [ miffile ]
+    if mbgfile is not None:
+        outputs.append( mbgfile )
+
+    cache = _cache()
+    key = None
+    if cache is not None:
+        key = cache_key( mifconv, miffile, mbgfile, icons, env )
+        if cache.fetch( key, outputs ):
+            return 0
+
+    result = run( mifconv, miffile, mbgfile, icons, env["ENV"] )
+    if result == 0 and key is not None:
+        cache.store( key, outputs )
+    return result
+
+def run( mifconv, miffile, mbgfile, icons, env ):
+    """Run mifconv in a private working folder.
+
+    @param mifconv: mifconv command. Relative paths in it are made absolute.
+    @param miffile: Path to the resulting .mif file.
+    @param mbgfile: Path to the resulting .mbg header or None.
+    @param icons: Paths to the source icons in order.
+    @param env: Environment variables for mifconv.
+    @return: Exit status of mifconv.
+    """
+    # Working folder next to the target, so that the results can be
+    # renamed into place.
+    folder = os.path.dirname( os.path.abspath( miffile ) )
+    if not os.path.isdir( folder ):
+        os.makedirs( folder )
+    workdir = tempfile.mkdtemp( prefix = ".mifconv", dir = folder )
+
+    try:
+        cmd = '%s "%s"' % ( absolute_command( mifconv ), os.path.basename( miffile ) )
+        if mbgfile is not None:
+            cmd += ' /h"%s"' % os.path.basename( mbgfile )
+        for icon in _stage_icons( workdir, icons ):
+            cmd += ' %s "%s"' % ( ICON_FLAGS, icon )
+
+        runenv = dict( [ ( k, str( v ) ) for ( k, v ) in env.items() ] )
+        for name in [ "TEMP", "TMP", "TMPDIR" ]:
+            runenv[name] = workdir
+
+        print cmd
+        result = sp.call( cmd, shell = True, cwd = workdir, env = runenv )
+        if result != 0:
+            return result
+
+        _move( os.path.join( workdir, os.path.basename( miffile ) ), miffile )
+        if mbgfile is not None:
+            _move( os.path.join( workdir, os.path.basename( mbgfile ) ), mbgfile )
+        return 0
+    finally:
+        shutil.rmtree( workdir, ignore_errors = True )
@@ -0,0 +1,111 @@
+"""
+Compiler output cache.
+
+Objects are cached with a key computed from the preprocessed source, the
+normalized preprocessor defines and compiler flags and the digest of the
+compiler binary, like ccache does. An unchanged translation unit is then
+restored from the cache after switching branches or 'scons -c' instead of
+being compiled again.
+
+Works with arm-none-symbianelf-gcc and mwccsym2. Enable with
+objcache=<folder>, the size is limited with objcache_size=<megabytes>.
+"""
+__license__ = "MIT License"
+
+import SCons.Action
+import arguments as ARGS
+import artifactcache
+import hashlib
+import os
+import subprocess as sp
+
+#: Name of the cache in artifactcache.CACHES
+CACHE_NAME = "object"
+
+def preprocessed_digest( env, command ):
+    """Run the preprocessor command and compute sha1 of its output.
+    @return: Hex digest or None if preprocessing failed.
+    """
+    # Popen requires plain strings in the environment
+    penv = dict( [ ( k, str( v ) ) for ( k, v ) in env["ENV"].items() ] )
+    # The errors are reported by the compiler, so stderr is discarded. A
+    # second pipe could fill up while stdout is read and block both.
+    devnull = open( os.devnull, "w" )
+    try:
+        p = sp.Popen( command, shell = True, env = penv,
+                      stdout = sp.PIPE, stderr = devnull )
+
+        h = hashlib.sha1()
+        block = p.stdout.read( 65536 )
+        while block:
+            h.update( block )
+            block = p.stdout.read( 65536 )
+    finally:
+        devnull.close()
+
+    if p.wait() != 0:
+        return None
+    return h.hexdigest()
+
+def ObjectCacheAction( comvar, ppvar, flagsvars ):
+    """Create compile action using the object cache.
+
+    @param comvar: Construction variable containing the compile command.
+    @param ppvar: Construction variable containing the preprocessor command.
+    @param flagsvars: Construction variables containing the compiler flags.
+    """
+    # NOTE: The closure must contain only plain values. SCons computes the
+    # action signature from them.
+    def cached( target, source, env ):
+        ppcommand = env.subst( "$" + ppvar, 0, target, source )
+        digest = preprocessed_digest( env, ppcommand )
+        if digest is None:
+            # Let the compiler report the errors
+            return SCons.Action.Action( "$" + comvar )( target, source, env )
+
+        h = hashlib.sha1()
+        h.update( digest )
+
+        # The order of the defines does not matter
+        defines = env.subst( "$_CPPDEFFLAGS", 0, target, source ).split()
+        defines.sort()
+        h.update( " ".join( defines ) )
+
+        for var in flagsvars:
+            h.update( " ".join( env.subst( "$" + var, 0, target, source ).split() ) )
+
+        # The compile command can start with a launcher like distcc
+        compiler = ppcommand.split()[0]
+        h.update( artifactcache.tool_digest( compiler, env ) )
+
+        # Debug information contains the source path
+        sourcepath = source[0].abspath.replace( os.getcwd(), "#" )
+        h.update( sourcepath )
+
+        return artifactcache.run_cached( CACHE_NAME, h.hexdigest(), comvar,
+                                         target, source, env,
+                                         [ x.abspath for x in target ] )
+
+    return SCons.Action.Action( cached, strfunction = None,
+                                varlist = [ comvar, ppvar ] )
+
+def install( env ):
+    """Route the C and C++ compile commands of env through the object cache.
+    Nothing is done if objcache is not given.
+    """
+    if ARGS.OBJECT_CACHE is None:
+        return
+
+    artifactcache.get_cache( CACHE_NAME, ARGS.OBJECT_CACHE, ARGS.OBJECT_CACHE_SIZE )
+
+    # Flags the preprocessor does not accept, like a precompiled header,
+    # can be replaced in CCPPFLAGS and CXXPPFLAGS.
+    env["CCPPFLAGS"]  = "$CFLAGS"
+    env["CXXPPFLAGS"] = "$CXXFLAGS"
+    env["CCPPCOM"]  = "$CC -E $CCPPFLAGS $CCFLAGS $_CCCOMCOM $SOURCES"
+    env["CXXPPCOM"] = "$CXX -E $CXXPPFLAGS $CCFLAGS $_CCCOMCOM $SOURCES"
+
+    env["OBJCACHE_CCCOM"]  = env["CCCOM"]
+    env["OBJCACHE_CXXCOM"] = env["CXXCOM"]
+    env["CCCOM"]  = ObjectCacheAction( "OBJCACHE_CCCOM", "CCPPCOM", [ "CFLAGS", "CCFLAGS" ] )
+    env["CXXCOM"] = ObjectCacheAction( "OBJCACHE_CXXCOM", "CXXPPCOM", [ "CXXFLAGS", "CCFLAGS" ] )
@@ -0,0 +1,90 @@
+"""
+Precompiled header support.
+
+GCCE and WINSCW include a system header into every source, gcce.h and the
+platform header. With pch=true the header is compiled once per compiler,
+release, flags and defines into the build folder and the compiled version
+is included instead. The objects depend on the precompiled header, which
+in turn depends on the headers it was compiled from.
+
+The header is compiled only with the defines shared by the components,
+not with their own ones such as __UID3__, so that the components can
+share it. The compile command is built from the key alone, never from the
+component environment that happens to create the node.
+"""
+__license__ = "MIT License"
+
+from arguments import COMPILER, RELEASE, SYMBIAN_VERSION
+from os.path import join
+import SCons.Defaults
+import SCons.Tool
+import hashlib
+import os
+
+#: Precompiled header nodes by key
+_NODES = {}
+
+def digest( *parts ):
+    """Compute key from the parts describing the compilation"""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update( repr( part ) )
+    return h.hexdigest()[:16]
+
+def get_folder( key ):
+    """Get absolute path of the folder for precompiled header 'key'"""
+    return os.path.abspath( join( "build%d_%d" % SYMBIAN_VERSION,
+                                  "%s_%s" % ( COMPILER, RELEASE ),
+                                  "pch", key ) )
+
+def _write_header( target, source, env ): #IGNORE:W0613
+    """Write the header to be precompiled"""
+    f = open( target[0].abspath, "w" )
+    try:
+        f.write( source[0].get_contents() )
+    finally:
+        f.close()
+    return None
+
+def get_node( env, key, target, header, content, command, scanned = (), **overrides ):
+    """Create builders for the wrapper header and the precompiled header
+    once per key. The wrapper is written when the build runs. The wrapper
+    and the scanned headers are scanned with the C scanner, so that the
+    precompiled header is rebuilt when any of the included headers changes.
+
+    @param command: Compile command of the wrapper, $SOURCE.
+    @param scanned: Headers included by other means than #include, such as
+                    __PRODUCT_INCLUDE__. Only scanned, not compiled.
+    @param overrides: Construction variables of the compile, e.g. CPPPATH
+                      and CPPDEFINES. Must be the same for all users of the key.
+    @return: Node of the precompiled header.
+    """
+    if key not in _NODES:
+        env.Command( header, env.Value( content ), _write_header )
+        _NODES[key] = env.Command( target, [ header ] + list( scanned ), command,
+                                   source_scanner = SCons.Defaults.CScan,
+                                   **overrides )[0]
+    return _NODES[key]
+
+def _make_emitter( emitter, nodevar ):
+    def pch_emitter( target, source, env ):
+        if emitter is not None:
+            target, source = emitter( target, source, env )
+        node = env.get( nodevar )
+        if node is not None:
+            env.Depends( target, node )
+        return target, source
+    return pch_emitter
+
+def install_emitters( env ):
+    """Make objects depend on the precompiled header in construction
+    variable PCH_C or PCH_CXX. Called once for the base environment.
+    """
+    static_obj = SCons.Tool.createObjBuilders( env )[0]
+    for suffix in SCons.Tool.CSuffixes + SCons.Tool.CXXSuffixes:
+        if suffix not in static_obj.emitter:
+            continue
+        nodevar = "PCH_CXX"
+        if suffix in SCons.Tool.CSuffixes:
+            nodevar = "PCH_C"
+        static_obj.emitter[suffix] = _make_emitter( static_obj.emitter[suffix], nodevar )
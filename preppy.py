@@ -601,12 +601,72 @@ def testgetmodule(name="testpreppy"):
 # cache found modules by source file name
 GLOBAL_LOADED_MODULE_DICTIONARY = {}
 
+#: Folder for the compiled templates given as sourcetext. None disables the
+#: disk cache, the templates are still compiled once per process.
+CACHE_FOLDER = None
+
+def templateKey(sourcetext):
+    """cache key of a template: digest of the text, VERSION and the bytecode version"""
+    import hashlib, imp
+    return hashlib.sha1(sourcetext + repr(VERSION) + imp.get_magic()).hexdigest()
+
+def loadCompiledTemplate(key):
+    """read compiled template from CACHE_FOLDER, None if not cached"""
+    if CACHE_FOLDER is None:
+        return None
+    import os, marshal
+    try:
+        f = open(os.path.join(CACHE_FOLDER, key + ".prepc"), "rb")
+        try:
+            return marshal.loads(f.read())
+        finally:
+            f.close()
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+def saveCompiledTemplate(key, code):
+    """write compiled template to CACHE_FOLDER. Failures are ignored."""
+    if CACHE_FOLDER is None:
+        return
+    import os, marshal
+    path = os.path.join(CACHE_FOLDER, key + ".prepc")
+    tmppath = "%s.%d" % (path, os.getpid())
+    try:
+        if not os.path.isdir(CACHE_FOLDER):
+            os.makedirs(CACHE_FOLDER)
+        f = open(tmppath, "wb")
+        try:
+            f.write(marshal.dumps(code))
+        finally:
+            f.close()
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmppath, path)
+    except (IOError, OSError):
+        try:
+            os.remove(tmppath)
+        except OSError:
+            pass
+
 def getPreppyModule(name, directory=".", source_extension=".prep", verbose=0, savefile=1,
                     sourcetext=None):
+    templatekey = None
     if sourcetext is not None:
         if verbose: print "sourcetext provided"
         sourcefilename = "<input text %s>" % name
         savefile = 0 # cannot savefile if source file provided
+        # compiled once per process and stored as bytecode on disk
+        templatekey = templateKey(sourcetext)
+        if GLOBAL_LOADED_MODULE_DICTIONARY.has_key(templatekey):
+            return GLOBAL_LOADED_MODULE_DICTIONARY[templatekey]
+        code = loadCompiledTemplate(templatekey)
+        if code is not None:
+            if verbose: print "compiled template found from cache"
+            from imp import new_module
+            result = new_module(name)
+            exec code in result.__dict__
+            GLOBAL_LOADED_MODULE_DICTIONARY[templatekey] = result
+            return result
     else:
         # see if the module exists as a python file
         from sys import path
@@ -635,9 +695,9 @@ def getPreppyModule(name, directory=".", source_extension=".prep", verbose=0, sa
             return module
         else:
             sourcetext = sourcefile.read()
-            import md5
+            import hashlib
             # NOTE: force recompile on each new version of this module.
-            sourcechecksum = md5.new(sourcetext + repr(VERSION)).digest()
+            sourcechecksum = hashlib.md5(sourcetext + repr(VERSION)).digest()
             if sourcechecksum==checksum:
                 # use the existing module. it matches
                 if verbose: print "checksums match, not regenerating python source"
@@ -689,8 +749,13 @@ __checksum__ = %s
     # now make a module
     from imp import new_module
     result = new_module(name)
-    exec out in result.__dict__
-    GLOBAL_LOADED_MODULE_DICTIONARY[sourcefilename] = result
+    code = compile(out, sourcefilename, "exec")
+    exec code in result.__dict__
+    if templatekey is not None:
+        saveCompiledTemplate(templatekey, code)
+        GLOBAL_LOADED_MODULE_DICTIONARY[templatekey] = result
+    else:
+        GLOBAL_LOADED_MODULE_DICTIONARY[sourcefilename] = result
     return result
 
 def cleantext(text):
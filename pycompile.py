@@ -0,0 +1,168 @@
+"""
+Python bytecode compilation with long-lived compiler processes.
+
+The sources are compiled by a small pool of ARGS.PYTHON_COMPILER processes
+which read the files to compile from a pipe, instead of starting a new
+interpreter for every module. A process is started for each parallel job
+when first needed and reused until the end of the build.
+
+The compiled files are cached by the source contents and the digest of the
+compiler executable, so unchanged modules are restored from the cache
+without the compiler. See pyccache=<folder>.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import artifactcache
+import atexit
+import hashlib
+import os
+import subprocess as sp
+import threading
+
+#: Name of the cache in artifactcache.CACHES
+CACHE_NAME = "pyc"
+
+#: Script run by the compiler processes. Reads tab separated source, output
+#: and display paths from stdin and answers "ok" or "error <message>".
+#: Compatible with old Python versions used by PyS60.
+DRIVER = """
+import sys, py_compile
+while 1:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    src, cfile, dfile = line.rstrip("\\n").split("\\t")
+    try:
+        py_compile.compile(src, cfile, dfile, True)
+        sys.stdout.write("ok\\n")
+    except Exception, e:
+        sys.stdout.write("error %s\\n" % str(e).replace("\\n", " "))
+    sys.stdout.flush()
+"""
+
+_LOCK = threading.Lock()
+#: Idle compiler processes
+_IDLE = []
+#: All started compiler processes
+_WORKERS = []
+
+class CompilerProcess( object ):
+    """Python compiler process fed over a pipe"""
+
+    def __init__( self, compiler ):
+        # Optimizations and docstring stripping are enabled only from
+        # the command line.
+        self.process = sp.Popen( [ compiler, "-OO", "-c", DRIVER ],
+                                 stdin = sp.PIPE, stdout = sp.PIPE )
+
+    def compile( self, source, cfile, dfile ):
+        """Compile source into cfile.
+        @return: None or error message.
+        @raise IOError: The process has exited.
+        """
+        self.process.stdin.write( "%s\t%s\t%s\n" % ( source, cfile, dfile ) )
+        self.process.stdin.flush()
+        answer = self.process.stdout.readline().rstrip( "\r\n" )
+        if answer == "ok":
+            return None
+        if answer == "":
+            raise IOError( "%s exited" % ARGS.PYTHON_COMPILER )
+        return answer[len( "error " ):]
+
+    def close( self ):
+        self.process.stdin.close()
+        self.process.wait()
+
+def _acquire():
+    """Get idle compiler process or start a new one"""
+    _LOCK.acquire()
+    try:
+        if _IDLE:
+            return _IDLE.pop()
+    finally:
+        _LOCK.release()
+
+    worker = CompilerProcess( ARGS.PYTHON_COMPILER )
+    _LOCK.acquire()
+    try:
+        _WORKERS.append( worker )
+    finally:
+        _LOCK.release()
+    return worker
+
+def _release( worker ):
+    _LOCK.acquire()
+    try:
+        _IDLE.append( worker )
+    finally:
+        _LOCK.release()
+
+def _discard( worker ):
+    """Drop broken compiler process. The next file starts a new one."""
+    _LOCK.acquire()
+    try:
+        if worker in _WORKERS:
+            _WORKERS.remove( worker )
+    finally:
+        _LOCK.release()
+    try:
+        worker.close()
+    except ( IOError, OSError ):
+        pass
+
+def _close_workers():
+    for worker in _WORKERS:
+        try:
+            worker.close()
+        except ( IOError, OSError ):
+            pass
+
+atexit.register( _close_workers )
+
+def _cache():
+    if ARGS.PYC_CACHE is None:
+        return None
+    return artifactcache.get_cache( CACHE_NAME, ARGS.PYC_CACHE, ARGS.PYC_CACHE_SIZE )
+
+def compile_files( target, source, env ):
+    """Compile the Python sources into the targets.
+    @return: Non-zero if some source failed to compile.
+    """
+    cache = _cache()
+    compiler = None
+    if cache is not None:
+        compiler = artifactcache.tool_digest( ARGS.PYTHON_COMPILER, env )
+
+    result = 0
+    for py, pyc in zip( source, target ):
+        cfile = pyc.abspath
+        dfile = os.path.basename( cfile )
+
+        key = None
+        if cache is not None:
+            h = hashlib.sha1()
+            h.update( compiler )
+            h.update( dfile )
+            h.update( artifactcache.file_digest( py.abspath ) )
+            key = h.hexdigest()
+            if cache.fetch( key, [ cfile ] ):
+                continue
+
+        worker = _acquire()
+        try:
+            error = worker.compile( py.abspath, cfile, dfile )
+        except ( IOError, OSError ), e:
+            # Do not reuse the broken process
+            _discard( worker )
+            error = str( e )
+        else:
+            _release( worker )
+
+        if error is not None:
+            print "Error compiling %s: %s" % ( py, error )
+            result = 1
+        elif key is not None:
+            cache.store( key, [ cfile ] )
+
+    return result
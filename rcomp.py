@@ -3,34 +3,50 @@
 __author__ = "Jussi Toivola"
 __license__ = "MIT License"
 
+import buildtrace
 import cpp
 import os
 import sys
+import winesession
 
 #: RComp command path
 RCOMP = os.environ["EPOCROOT"] + os.path.join( "epoc32", "tools", "rcomp" )
 if sys.platform == "linux2":
-    RCOMP = "wine " + RCOMP + ".exe"
+    RCOMP = RCOMP + ".exe"
 
 def RComp( env, rsc, rsg, rss, options, includes, fileinc, defines, extra_depends = None ):
-    """Utility for creating Command for Symbian resource compiler"""
-    # Preprocess the resource file first
-    rpp = ".".join( os.path.basename( rss ).split( "." )[: - 1] + ["rpp"] )
-    rpp = os.path.abspath(os.path.join( os.path.dirname( rsg ), rpp ))
+    """Utility for creating Command for Symbian resource compiler.
+    The .rsg header is not created if rsg is None.
+    """
+    # Preprocess the resource file first. Named after the output, which
+    # differs between the languages of the resource.
+    rpp = os.path.basename( rsc )
+    if rpp.lower().endswith( ".rsc" ):
+        rpp = rpp[:-4]
+    rpp = os.path.abspath( os.path.join( os.path.dirname( rsc ), rpp + ".rpp" ) )
     
     import relpath    
     rpp_build = cpp.Preprocess( env, rpp, rss, includes, fileinc, defines + ["_UNICODE" ] )
     rss = relpath.relpath( os.path.abspath( "." ), os.path.abspath( rss ) )
     # FIXME: For some strange reason, using the rcomp when creating bootup resource fails
     #        if using the 'normal' way( colorizer.py must mess it up somehow )
+    @buildtrace.traced( "rcomp" )
     def build(target, source, env):
         
-        cmd = RCOMP + ' -u %s -o\"%s\" -h\"%s\" -s\"%s\" -i\"%s\" ' % \
-                ( options, rsc, rsg, rpp, rss )
-        os.system(cmd)        
+        header = ""
+        if rsg is not None:
+            header = '-h\"%s\"' % rsg
+        args = '-u %s -o\"%s\" %s -s\"%s\" -i\"%s\" ' % \
+                ( options, rsc, header, rpp, rss )
+        # Started through the persistent wine session on Linux
+        return winesession.run( RCOMP, args )
+
     if extra_depends is not None:
       for dep in extra_depends:
         env.Depends( rpp_build, dep)
-    resource_build = env.Command( [rsc, rsg], [rpp, rss], build )
+    targets = [ rsc ]
+    if rsg is not None:
+        targets.append( rsg )
+    resource_build = env.Command( targets, [rpp, rss], build )
     env.Depends(resource_build, rpp)
     return resource_build
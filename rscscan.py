@@ -0,0 +1,159 @@
+"""
+Include scanner for the resource files.
+
+The resources are preprocessed with cpp -I-, so also the quoted includes
+are searched only from the include paths, not from the folder of the
+including file. The include paths are read from RSCPATH of the command,
+or from CPPPATH if not set.
+
+The generated .rsg and .mbg headers are found as build targets before they
+exist, which orders the resources after the ones producing their headers.
+
+The includes of a file are cached by its contents in rscscan.cache next to
+the user configuration, so unchanged headers are not parsed again.
+"""
+__license__ = "MIT License"
+
+from artifactcache import file_digest
+import atexit
+import diskcache
+import os
+import re
+import threading
+
+import SCons.Node.FS
+import SCons.Scanner
+
+#: Extensions of resource sources and the headers they include
+SUFFIXES = [ ".rss", ".rpp", ".rh", ".rls", ".hrh", ".loc", ".rsg", ".mbg" ]
+
+#: Extensions of the generated headers. Missing ones are reported.
+GENERATED_SUFFIXES = [ ".rsg", ".mbg" ]
+
+#: Name of the cache in diskcache
+CACHE_NAME = "rscscan"
+#: Files in the cache until the entries not used by the build are dropped
+CACHE_SIZE = 20000
+
+INCLUDE_RE = re.compile( r'^[ \t]*#[ \t]*include[ \t]*[<"]([^>"\r\n]+)[>"]', re.M )
+
+_LOCK = threading.Lock()
+#: Includes by file digest
+_INCLUDES = None
+#: Digests of the files scanned by this build
+_USED = set()
+_CHANGED = False
+#: Reported missing includes as ( path, name )
+_REPORTED = set()
+
+def parse( contents ):
+    """Get the included file names in order"""
+    return tuple( INCLUDE_RE.findall( contents ) )
+
+def includes( path ):
+    """Get the included file names of a file. Cached by the file contents."""
+    global _INCLUDES, _CHANGED
+
+    digest = file_digest( path )
+    _LOCK.acquire()
+    try:
+        if _INCLUDES is None:
+            _INCLUDES = diskcache.load( CACHE_NAME )
+        _USED.add( digest )
+        names = _INCLUDES.get( digest )
+    finally:
+        _LOCK.release()
+    if names is not None:
+        return names
+
+    f = open( path, "rb" )
+    try:
+        names = parse( f.read() )
+    finally:
+        f.close()
+
+    _LOCK.acquire()
+    try:
+        _INCLUDES[digest] = names
+        _CHANGED = True
+    finally:
+        _LOCK.release()
+    return names
+
+def _save():
+    global _INCLUDES
+    if not _CHANGED:
+        return
+    if len( _INCLUDES ) > CACHE_SIZE:
+        _INCLUDES = dict( [ ( x, _INCLUDES[x] ) for x in _USED ] )
+    diskcache.save( CACHE_NAME, _INCLUDES )
+
+atexit.register( _save )
+
+def _path( env, dir = None, target = None, source = None, argument = None ):
+    """Include folders of the command"""
+    var = "RSCPATH"
+    if not env.has_key( var ):
+        var = "CPPPATH"
+    return SCons.Scanner.FindPathDirs( var )( env, dir, target, source, argument )
+
+def walk( node, path ):
+    """Find the includes of a file recursively. Files which do not exist
+    yet are not scanned.
+    @param path: Include folders as Dir nodes.
+    @return: List of ( include name, node or None if not found ).
+    """
+    result = []
+    seen = set()
+    stack = [ node ]
+    while stack:
+        current = stack.pop()
+        if current in seen or not current.exists():
+            continue
+        seen.add( current )
+        for name in includes( current.abspath ):
+            found = SCons.Node.FS.find_file( name.replace( "\\", "/" ), path )
+            result.append( ( name, found ) )
+            if found is not None:
+                stack.append( found )
+    return result
+
+def _report_missing( node, name ):
+    """Report a generated header which is neither built nor found"""
+    key = ( node.abspath, name )
+    _LOCK.acquire()
+    try:
+        if key in _REPORTED:
+            return
+        _REPORTED.add( key )
+    finally:
+        _LOCK.release()
+
+    import diagnostics
+    from echoutil import logwarning
+    record = diagnostics.report( node.abspath, node.abspath, None, "warning",
+                                 "%s is not built and not found from the include paths" % name )
+    logwarning( "%(file)s: %(message)s" % record )
+
+def scan( node, env, path = () ):
+    """Find the included nodes. Missing files are left for cpp to report.
+    Generated headers are looked up when the build runs, when the targets
+    of all components are known, and reported if missing.
+    """
+    if not node.exists():
+        return []
+
+    result = []
+    for name in includes( node.abspath ):
+        found = SCons.Node.FS.find_file( name.replace( "\\", "/" ), path )
+        if found is not None:
+            result.append( found )
+        elif os.path.splitext( name )[1].lower() in GENERATED_SUFFIXES:
+            _report_missing( node, name )
+    return result
+
+#: Scanner for the resource files
+SCANNER = SCons.Scanner.Base( scan, "ResourceScanner",
+                              path_function = _path,
+                              skeys = SUFFIXES,
+                              recursive = True )
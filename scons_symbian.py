@@ -2,9 +2,13 @@
 Main S4S module
 """
 #pylint: disable-msg=E0611
+import time
+_IMPORT_START = time.time()
+
 from SCons.Builder import Builder
-from SCons.Script import (Command, Copy, DefaultEnvironment, Install, Mkdir, Clean, Default)
+from SCons.Script import (AddOption, Command, Copy, DefaultEnvironment, Install, Mkdir, Clean, Default)
 from SCons.Node.FS import File
+import SCons.Errors
 
 # This will speed up startup.
 # See http://osdir.com/ml/programming.tools.scons.user/2006-05/msg00112.html
@@ -14,7 +18,9 @@ from SCons.Node.FS import File
 from SCons.Defaults import *
 SCons.Defaults.DefaultEnvironment(tools = [])
 
-import arguments as ARGS
+import lazyimport
+ARGS = lazyimport.timed_import( "arguments" )
+import buildtrace
 # TODO(mika.raento): previously scons_symbian imported all names from
 # arguments.py, including all the names that it imported from config.
 # Importing the names imports the values of the variables as the import runs.
@@ -29,17 +35,23 @@ from config import *
 from echoutil import loginfo
 from arguments import get_output_folder, RUNNING_SCONS, VARS, EPOCROOT, EPOC32, EPOC32_DATA, EPOC32_INCLUDE, EPOC32_TOOLS, EPOC32_RELEASE, PYTHON_COMPILER, PYTHON_DOZIP, COMPILER, RELEASE, GCCE_OPTIMIZATION_FLAGS, WINSCW_OPTIMIZATION_FLAGS, MMP_EXPORT_ENABLED, DO_CREATE_SIS, DO_DUPLICATE_SOURCES, ENSYMBLE_AVAILABLE, UI_VERSION, SYMBIAN_VERSION, PLATFORM_HEADER, PACKAGE_FOLDER, COMPONENTS, COMPONENTS_EXCLUDE, CMD_LINE_DEFINES, CMD_LINE_LIBS, STANDARD_DEFINES, EXTRA_DEFINES, DEFAULT_SYMBIAN_DEFINES, HELP_ENABLED, PATH_ARM_TOOLCHAIN
 from os.path import join, basename, abspath
-import zipfile
-import py_compile
+import fnmatch
 import re
-import mmp_parser
-import colorizer
-import gcce
 import os
-import symbian_pkg
-import winscw
-import rcomp
 import textwrap
+
+# Subsystems are imported when first needed
+mmp_parser  = lazyimport.LazyModule( "mmp_parser" )
+colorizer   = lazyimport.LazyModule( "colorizer" )
+gcce        = lazyimport.LazyModule( "gcce" )
+symbian_pkg = lazyimport.LazyModule( "symbian_pkg" )
+winscw      = lazyimport.LazyModule( "winscw" )
+rcomp       = lazyimport.LazyModule( "rcomp" )
+pycompile   = lazyimport.LazyModule( "pycompile" )
+ziparchive  = lazyimport.LazyModule( "ziparchive" )
+mifconv     = lazyimport.LazyModule( "mifconv" )
+rscscan     = lazyimport.LazyModule( "rscscan" )
+staging     = lazyimport.LazyModule( "staging" )
 #pylint: enable-msg=E0611
 
 __author__ = "Jussi Toivola"
@@ -47,8 +59,13 @@ __license__ = "MIT License"
 
 # TODO: freeze # perl -S /epoc32/tools/efreeze.pl %(FROZEN)s %(LIB_DEFS)s
 
-#: Handle to console for colorized output( and process launching )
-_OUTPUT_COLORIZER = colorizer.OutputConsole()
+AddOption( "--s4s-import-profile", dest = "s4s_import_profile",
+           action = "store_true", default = False,
+           help = "Print import times of the SCons for Symbian modules." )
+
+#: Handle to console for colorized output( and process launching ).
+#: Created when the first public API is called.
+_OUTPUT_COLORIZER = None
 
 def publicapi(func, *args,**kwargs):
     """ Decorator for public APIs to initialize system """
@@ -63,6 +80,9 @@ def publicapi(func, *args,**kwargs):
     return api
 
 def _finalize_symbian_scons():
+  global _OUTPUT_COLORIZER
+  if _OUTPUT_COLORIZER is None:
+    _OUTPUT_COLORIZER = colorizer.OutputConsole()
   if ARGS.ResolveInstallDirectories():
     # Set ARGS.INSTALL_EPOCROOT as default target, so the stuff will be
     # built for emulator.
@@ -180,24 +200,17 @@ def SymbianPackage( package, ensymbleargs = None, pkgargs = None,
         PKG_HANDLER.pkg_sis[pkgfile] = source_package
         PKG_HANDLER.pkg_template[pkgfile] = (pkgtemplate)
 
-        Command( pkgfile, PKG_HANDLER.pkg_files[package].keys(),
-                        PKG_HANDLER.GeneratePkg, ENV = os.environ )
-
-        # Set deps
-        files = PKG_HANDLER.Package( package )
-        files_value = env.Value(files)
-        env.Depends( pkgfile, files_value )
+        # The pkg lists only the names of the files, so it depends on the
+        # digest of the file map, the arguments and the template instead of
+        # the files themselves.
+        digest_value = env.Value( symbian_pkg.PkgDigestValue( PKG_HANDLER, pkgfile ) )
+        Command( pkgfile, digest_value, PKG_HANDLER.GeneratePkg, ENV = os.environ )
 
-        pkgargs = PKG_HANDLER.PackageArgs( package )
-        pkgargs_value = env.Value(pkgargs)
-        env.Depends( pkgfile, pkgargs_value )
+        # Not removed before generating, an unchanged pkg is not rewritten.
+        env.Precious( pkgfile )
 
-        if pkgtemplate is not None:
-            if os.path.isfile(pkgtemplate):
-                env.Depends( pkgfile, pkgtemplate )
-            else:
-                template_value = env.Value(pkgtemplate)
-                env.Depends( pkgfile, template_value )
+        if pkgtemplate is not None and os.path.isfile(pkgtemplate):
+            env.Depends( pkgfile, pkgtemplate )
     # Create pkg file
     if ARGS.COMPILER != ARGS.COMPILER_WINSCW:
         if pkgargs is not None:
@@ -287,7 +300,7 @@ def SymbianPackage( package, ensymbleargs = None, pkgargs = None,
         elif pkgfile is not None:
             result = symbian_pkg.Makesis( pkgfile,
                                           package,
-                                          installed = PKG_HANDLER.pkg_files[package].keys() )
+                                          installed = PKG_HANDLER.PackageFiles( package ).keys() )
 
             cert = pkgargs.get("cert", None )
             key  = pkgargs.get("key", None)
@@ -295,13 +308,70 @@ def SymbianPackage( package, ensymbleargs = None, pkgargs = None,
                 sisx = package.split(".")
                 sisx = ".".join( sisx[:-1] ) + constants.SIGNSIS_OUTPUT_EXTENSION
                 env.Depends( sisx, package )
-                env.Depends( sisx, PKG_HANDLER.pkg_files[package].keys() + result )
+                env.Depends( sisx, PKG_HANDLER.PackageFiles( package ).keys() + result )
 
                 passwd = pkgargs.get( "passwd", "" )
                 result.append( symbian_pkg.SignSis( sisx, package, pkgargs["cert"], pkgargs["key"], passwd ) )
 
     if ARGS.DO_CREATE_SIS:
-        return create_install_file( PKG_HANDLER.Package(package).keys() )
+        return create_install_file( PKG_HANDLER.PackageFiles(package).keys() )
+
+@publicapi
+def SymbianPackageVariants( package, variants, pkgargs = None, pkgtemplate = None,
+                            env = None ):
+    """
+    Create variants of a package in one build. The variants share the
+    payload of the base package and overlay their own files and pkg
+    arguments. The shared files are staged once into the folder of the
+    base package and listed from there in the pkg of every variant.
+    The makesis and signsis commands of the variants are independent and
+    run in parallel with -j.
+
+    Call after the payload of the base package has been declared with
+    SymbianProgram and ToPackage.
+
+    @param package: Name of the base package whose payload is shared.
+    @type package: str
+
+    @param variants: Variants by package name. Each is a dictionary with
+                     optional keys:
+                       "files"   : List of ( target, source ) added to or
+                                   replacing the files of the base package.
+                       "pkgargs" : Arguments overriding the shared pkgargs.
+                     For example:
+                       { "app_op1.sis" : { "files"   : [ ( "resource/apps", "op1/logo.mif" ) ],
+                                           "pkgargs" : { "vendor" : "Operator 1" } } }
+    @type variants: dict
+
+    @param pkgargs: Arguments shared by the variants. See L{SymbianPackage}.
+    @type pkgargs: dict
+
+    @param pkgtemplate: preppy template for generating the pkg files.
+    @type pkgtemplate: str
+
+    @return: Paths to the variant packages.
+    @rtype: list
+    """
+    if env is None:
+        env = DefaultEnvironment()
+
+    if pkgargs is None:
+        pkgargs = {}
+
+    names = variants.keys()
+    names.sort()
+    for name in names:
+        variant = variants[name]
+        PKG_HANDLER.pkg_base[name] = package
+
+        for target, source in variant.get( "files", [] ):
+            ToPackage( env, None, name, target, source, toemulator = False )
+
+        variantargs = pkgargs.copy()
+        variantargs.update( variant.get( "pkgargs", {} ) )
+        SymbianPackage( name, pkgargs = variantargs, pkgtemplate = pkgtemplate, env = env )
+
+    return names
 
 @publicapi
 def SymbianHelp( source, uid, env = None ):
@@ -327,17 +397,16 @@ def _is_python_file( filepath ):
             return True
     return False
 
+@buildtrace.traced( "zip" )
 def _zipfile(target,source,env):
     """ """
     zippath = target[0].abspath
 
-    z = zipfile.ZipFile(zippath, 'w', zipfile.ZIP_DEFLATED)
     files = ZIP_FILES[zippath]["files"]
     print( "Install files into archive: %s" % (zippath) )
-    for s,t in files:
-        print s,t
-        z.write( s, t )
-    z.close()
+    # Only the changed files are compressed again
+    compressed, copied = ziparchive.update( zippath, [ ( str(s), t ) for s, t in files ] )
+    print( "%d files compressed, %d unchanged" % ( compressed, copied ) )
 
 ZIP_FILES = {}
 @publicapi
@@ -356,6 +425,8 @@ def File2Zip(zipfilepath, source, arcpath, env = None ):
         # Create command
         ZIP_FILES[zipfilepath] = { "files" : files }
         env.Command( zipfilepath, "", _zipfile)
+        # Member digests of the archive
+        env.Clean( zipfilepath, zipfilepath + ".manifest" )
     else:
         files = ZIP_FILES[zipfilepath]["files"]
 
@@ -364,18 +435,12 @@ def File2Zip(zipfilepath, source, arcpath, env = None ):
 
     return zipfilepath
 
+@buildtrace.traced( "pycompile" )
 def _py2pyc(target,source,env):
     """ Compile python sources to .pyc using selected python compiler """
-    # Can strip docstrings and enable optimizations only through command line
-    # But no matter since we could be on Py 2.6 but 2.5 is needed
-    cmd = r"""%s -OO -c "import py_compile as p;""" % ARGS.PYTHON_COMPILER
-
-    files = zip(source,target )
-    for py, pyc in files:
-        cmd += "p.compile(r'%s',cfile=r'%s', dfile='%s');" % ( py, pyc, basename(pyc.abspath) )
-
-    os.system( cmd )
-    return 0
+    # The compiler processes are shared by all the modules.
+    # We could be on Py 2.6 but 2.5 is needed
+    return pycompile.compile_files( target, source, env )
 
 @publicapi
 def Python2ByteCode( source, target = ".pyc", env = None ):
@@ -394,7 +459,7 @@ def Python2ByteCode( source, target = ".pyc", env = None ):
 
 #: Holds the file source->target paths for each package
 #: This information is be used to generate the pkg file.
-PKG_HANDLER = symbian_pkg.PKGHandler()
+PKG_HANDLER = lazyimport.LazyProxy( lambda: symbian_pkg.PKGHandler() )
 
 @publicapi
 def ToPackage( env = None,     package_drive_map = None,
@@ -486,7 +551,7 @@ def ToPackage( env = None,     package_drive_map = None,
             pkg[pkgsource] = join( drive, pylibzip )
 
         if toemulator and ARGS.COMPILER == ARGS.COMPILER_WINSCW:
-            env.Install( join( ARGS.INSTALL_EMULATOR_C, dirname(pylibzip) ), pkgsource )
+            staging.Install( env, join( ARGS.INSTALL_EMULATOR_C, dirname(pylibzip) ), pkgsource )
 
         return fullzippath
 
@@ -497,14 +562,15 @@ def ToPackage( env = None,     package_drive_map = None,
         env.Depends( symbian_pkg.GetPkgFilename( package ), join( ARGS.PACKAGE_FOLDER, package, pkg[pkgsource] ) )
 
         package_target = join( ARGS.PACKAGE_FOLDER, package, drive, target )
-        cmd = env.Install( package_target, source )
+        # Linked instead of copied with stage=link|reflink
+        cmd = staging.Install( env, package_target, source )
         Clean( cmd,join( ARGS.PACKAGE_FOLDER, package) )
 
         if drive == "":
             pkg[pkgsource] = join( "any", target, basename( source ) )
 
         if toemulator and ARGS.COMPILER == ARGS.COMPILER_WINSCW:
-            env.Install( join( ARGS.INSTALL_EMULATOR_C, target ), source )
+            staging.Install( env, join( ARGS.INSTALL_EMULATOR_C, target ), source )
 
     return target
 
@@ -516,39 +582,26 @@ def SymbianTargetPath(target, targettype = ""):
         p = p[:-1]
     return os.path.abspath(p)
 
+@buildtrace.traced( "mifconv" )
 def SymbianIconCommand(env, target, source):
     """SCons command for running the mifconv icon conversion tool."""
     
     # Creates 32 bit icons
     if env['custom_mifconv']:
-        convert_icons_cmd = (env['custom_mifconv'] + r' "%s"').replace( "\\", "/" )
+        # May have arguments, e.g. wine tools/mifconv.exe
+        mifconv_cmd = mifconv.absolute_command( env['custom_mifconv'] )
     else:
-        convert_icons_cmd = ( ARGS.EPOCROOT + r'epoc32/tools/mifconv "%s"' ).replace( "\\", "/" )
+        mifconv_cmd = os.path.abspath( ARGS.EPOCROOT + r'epoc32/tools/mifconv' )
+        mifconv_cmd = mifconv_cmd.replace( "\\", "/" )
 
-    if os.name == 'nt':
-        source_icons   = source
-        target_miffile = target[0].abspath
-        if ":" in target_miffile:
-            target_miffile = target_miffile.split(":")[-1]
-    else:
-        # TODO: Use source[0].rel_path ?
-        from relpath import relpath
-        source_icons = []
-        for icon in source:
-            source_icons.append(relpath(os.getcwd(), icon.tpath))
-        target_miffile = target[0].tpath
-
-    cmd = convert_icons_cmd % ( target_miffile )
+    mbg_filename = None
     if len(target) > 1:
         mbg_filename = target[1].abspath
-        cmd += r' /h"' + mbg_filename + r'"'
-
-    for icon in source_icons:
-      cmd += r' /c32,1 "' + icon.abspath + r'"'
 
-        # TODO: Use colorizer
-    print cmd
-    return os.system( cmd )
+    # Runs in a private folder, so icons can be converted in parallel.
+    # The results are cached, see mifcache=<folder>
+    return mifconv.convert( mifconv_cmd, target[0].abspath, mbg_filename,
+                            [ icon.abspath for icon in source ], env )
 
 @publicapi
 def SymbianIconBuilder(target, source, env = None, custom_mifconv = None ):
@@ -617,8 +670,6 @@ def SymbianIcon(icons, env = None, mif_filename = None, mbg_filename = None, pac
       target_mbg  = template % ( mbg_filename )
       resultables.append(target_mbg)
 
-    env.SideEffect("dont_build_more_mifs_at_same_time.txt", resultables)
-    
     SymbianIconBuilder(resultables, source_icons, env = env, custom_mifconv = custom_mifconv)
 
     # Install to default locations
@@ -654,6 +705,7 @@ def SymbianProgram( target, targettype = None, #IGNORE:W0621
                     definput = None, capabilities = None,
                     icons = None, resources = None,
                     rssdefines = None,
+                    languages = None,
                     defines = None,
                     help = None,
                     sysincludes = None,
@@ -662,6 +714,8 @@ def SymbianProgram( target, targettype = None, #IGNORE:W0621
                     win32_libraries = None,
                     win32_subsystem = None,
                     win32_headers = False,
+                    unity = None,
+                    unity_exclude = None,
                     # Sis stuff
                     package = "",
                     package_drive_map = None,
@@ -721,6 +775,15 @@ def SymbianProgram( target, targettype = None, #IGNORE:W0621
     @param rssdefines: Preprocessor definitions for resource compiler.
     @type rssdefines: list
 
+    @param languages: Languages of the resources. A resource is compiled for
+                      each language with LANGUAGE_<code> defined, e.g.
+                      [ "sc", 1, 2 ] creates .rsc, .r01 and .r02 files. The
+                      .rsg header is created once, by the first language
+                      of the list. The abbreviations such as "en" are
+                      accepted, see RESOURCE_LANGUAGES. A language given
+                      twice is compiled once. Default: [ "sc" ]
+    @type languages: list
+
     @param elf2e32_args: Extra arguments to elf2e32 Symbian Post Linker
     @param elf2e32_args: str
 
@@ -732,6 +795,15 @@ def SymbianProgram( target, targettype = None, #IGNORE:W0621
 
     @param win32_headers: Whether to add win32 include paths (default False)
 
+    @param unity: Compile C++ sources in batches of N sources combined into one
+                  unity source. Overrides the unity command line argument.
+                  Sources defining file-local symbols are compiled separately.
+    @type unity: int
+
+    @param unity_exclude: Sources to compile separately in unity build.
+                          Paths or fnmatch patterns, e.g. [ "src/*view.cpp" ].
+    @type unity_exclude: list
+
     @param package:       Path to installer file. If given, an installer is automatically created.
                           The files are copied to L{arguments.PACKAGE_FOLDER} and
                           Ensymble is used to create an installer package with simplesis command.
@@ -764,6 +836,101 @@ def SymbianProgram( target, targettype = None, #IGNORE:W0621
     handler = SymbianProgramHandler( **kwargs )
     return handler.Process()
 
+#: Sources containing these cannot be combined into a unity source.
+#: File-local symbols of two sources would clash.
+_UNITY_EXCLUDE_RE = re.compile( r"^\s*(static\s|LOCAL_[CD]\s|namespace\s*\{|"
+                                r"#\s*undef\s|#\s*pragma\s+data_seg)", re.M )
+
+#: Suffixes of sources combined in unity build
+_UNITY_SUFFIXES = [ ".cpp", ".cc", ".cxx" ]
+
+def _is_unity_source( path, exclude ):
+    """Check if source can be combined into unity source"""
+    if os.path.splitext( path )[1].lower() not in _UNITY_SUFFIXES:
+        return False
+
+    normpath = path.replace( "\\", "/" )
+    for pattern in exclude:
+        pattern = pattern.replace( "\\", "/" )
+        if fnmatch.fnmatch( normpath, pattern ) or \
+           fnmatch.fnmatch( basename( normpath ), pattern ):
+            return False
+
+    try:
+        f = open( path )
+        try:
+            data = f.read()
+        finally:
+            f.close()
+    except IOError:
+        # Generated during build
+        return False
+
+    return _UNITY_EXCLUDE_RE.search( data ) is None
+
+def _create_unity_cpp( target, source, env ):#IGNORE:W0613
+    """Write unity source including the combined sources"""
+    paths = source[0].get_contents().split( "\n" )
+    f = open( target[0].abspath, "w" )
+    try:
+        f.write( "// scons-generated unity source file\n" )
+        for path in paths:
+            f.write( '#include "%s"\n' % path )
+    finally:
+        f.close()
+    return None
+
+#: Symbian language codes by the two letter abbreviations of TLanguage
+RESOURCE_LANGUAGES = {
+    "EN" :  1, "FR" :  2, "GE" :  3, "SP" :  4, "IT" :  5, "SW" :  6,
+    "DA" :  7, "NO" :  8, "FI" :  9, "AM" : 10, "SF" : 11, "SG" : 12,
+    "PO" : 13, "TU" : 14, "IC" : 15, "RU" : 16, "HU" : 17, "DU" : 18,
+    "BL" : 19, "AU" : 20, "BF" : 21, "AS" : 22, "NZ" : 23, "IF" : 24,
+    "CS" : 25, "SK" : 26, "PL" : 27, "SL" : 28, "TC" : 29, "HK" : 30,
+    "ZH" : 31, "JA" : 32, "TH" : 33,
+}
+
+def _resource_language( language ):
+    """Get file extension and macro of a resource language
+    @param language: "sc", Symbian language code, e.g. 1 or "01", or its
+                     abbreviation, e.g. "en". See RESOURCE_LANGUAGES.
+    @return: ( extension, LANGUAGE_ macro )
+    """
+    language = str( language ).upper()
+    if language == "SC":
+        return "rsc", "LANGUAGE_SC"
+    if language in RESOURCE_LANGUAGES:
+        code = RESOURCE_LANGUAGES[language]
+    elif language.isdigit():
+        code = int( language )
+    else:
+        raise SCons.Errors.UserError( "Unknown resource language '%s'. Use 'sc', "
+                                      "a language code or one of: %s" %
+                                      ( language.lower(),
+                                        ", ".join( sorted( RESOURCE_LANGUAGES ) ).lower() ) )
+    code = "%02d" % code
+    return "r" + code, "LANGUAGE_" + code
+
+def _unique_languages( languages ):
+    """Drop the repeated resource languages, e.g. 1 after "en", keeping the
+    order. The first language creates the .rsg header.
+    """
+    result = []
+    seen = set()
+    for language in languages:
+        extension = _resource_language( language )[0]
+        if extension not in seen:
+            seen.add( extension )
+            result.append( language )
+    return result
+
+def _is_registration_resource( rss_path ):
+    """Is the resource an application registration file, e.g. myapp_reg.rss.
+    Those are not localized and are installed to the import folder.
+    """
+    name = os.path.splitext( os.path.basename( rss_path ) )[0]
+    return name.lower().endswith( "_reg" )
+
 class SymbianProgramHandler(object):
     """Internal class for handling the SymbianProgram function call"""
     def __init__(self, **kwargs):
@@ -774,6 +941,7 @@ class SymbianProgramHandler(object):
         self.target = None
         self.extra_depends = None
         self.sysincludes = None
+        self.languages = None
         self.origsources = [] # Sources not altered for BuildDir
         self.origlibraries = []
         # Store the keywords as instance attributes
@@ -802,6 +970,38 @@ class SymbianProgramHandler(object):
 
         return True
 
+    def _combineSources(self):
+        """Replace the sources with unity sources, if enabled.
+        Sets self.sources.
+        """
+        count = self.unity
+        if count is None:
+            count = ARGS.UNITY
+        if count < 2:
+            return
+
+        exclude = self.unity_exclude or []
+        sources  = []
+        combined = []
+        for node, path in zip( self.sources, self.origsources ):
+            if _is_unity_source( path, exclude ):
+                combined.append( ( node, abspath( path ).replace( "\\", "/" ) ) )
+            else:
+                sources.append( node )
+
+        for index in xrange( 0, len( combined ), count ):
+            batch = combined[index:index + count]
+            if len( batch ) == 1:
+                sources.append( batch[0][0] )
+                continue
+
+            unity_cpp = join( self.output_folder, "%s_unity%d.cpp" % ( self.target, index / count ) )
+            paths = "\n".join( [ x[1] for x in batch ] )
+            self._env.Command( unity_cpp, self._env.Value( paths ), _create_unity_cpp )
+            sources.append( self._env.File( unity_cpp ) )
+
+        self.sources = sources
+
     def _handleIcons(self):
         """Sets self.converted_icons"""
 
@@ -849,7 +1049,7 @@ class SymbianProgramHandler(object):
         installed = []
         if ARGS.COMPILER == ARGS.COMPILER_WINSCW:
             # Copy to SDK to be used with simulator
-            postcommands.append( Copy( sdkpath, copysource ) )
+            postcommands.append( staging.Stage( sdkpath, copysource ) )
             installed.append( sdkpath )
 
         if self.output_libpath is not None:
@@ -858,7 +1058,7 @@ class SymbianProgramHandler(object):
                 ARGS.COMPILER == ARGS.COMPILER_GCCE and self.targettype == ARGS.TARGETTYPE_LIB :
 
                 s, t = self.output_libpath
-                postcommands.append( Copy( t, s ) )
+                postcommands.append( staging.Stage( t, s ) )
                 installed.append( t )
 
         if len(installed) > 0:
@@ -877,6 +1077,36 @@ class SymbianProgramHandler(object):
 
         return installed
 
+    def _resourceProducers( self, rss_paths ):
+        """Map the .rsg headers of the resources to the installed headers.
+        @return: Dictionary of lowercase .rsg name: path to the .rsg.
+        """
+        producers = {}
+        for rss_path in rss_paths:
+            rss_notype = ".".join( os.path.basename( rss_path ).split( "." )[: - 1] )
+            rsg_name = "%s.rsg" % rss_notype
+            producers[rsg_name.lower()] = join( ARGS.INSTALL_EPOC32_INCLUDE, rsg_name )
+        return producers
+
+    def _resourceDepends( self, rss_path, producers ):
+        """Find the .rsg headers the resource includes, also through other
+        headers, from the other resources of the component. Missing
+        headers are reported by rscscan when the build runs.
+        @return: List of .rsg paths to build before the resource.
+        """
+        own = "%s.rsg" % ".".join( os.path.basename( rss_path ).split( "." )[: - 1] )
+        path = tuple( [ self._env.Dir( x ) for x in self.sysincludes + self.includes ] )
+
+        # Generated resources are not scanned here but by the scanner
+        depends = []
+        for name, node in rscscan.walk( self._env.File( rss_path ), path ):
+            rsg_name = os.path.basename( name.replace( "\\", "/" ) ).lower()
+            if rsg_name == own.lower() or rsg_name not in producers:
+                continue
+            if producers[rsg_name] not in depends:
+                depends.append( producers[rsg_name] )
+        return depends
+
     #TODO: Create main interface SymbianResource for special resource compiling
     def _convertResources( self, extra_depends = None):
         """
@@ -895,36 +1125,34 @@ class SymbianProgramHandler(object):
         self.resource_headers    = []
 
         if self.resources is not None:
-            # Make the resources dependent on previous resource
-            # Thus the resources must be listed in correct order.
-            prev_resource = None
-
+            rss_paths = []
             for rss_path in self.resources:
                 if type(rss_path) != str:
                     #Assuming File type then
                     rss_path = rss_path.abspath
-                    #import pdb;pdb.set_trace()
+                rss_paths.append( rss_path )
+
+            # The resources are built in parallel, ordered only by the
+            # .rsg headers they include from each other.
+            producers = self._resourceProducers( rss_paths )
 
+            for rss_path in rss_paths:
                 rss_notype = ".".join( os.path.basename( rss_path ).split( "." )[: - 1] ) # ignore rss
                 converted_rsg = join( self.output_folder, "%s.rsg" % rss_notype )
-                converted_rsc = join( self.output_folder, "%s.rsc" % rss_notype )
-                self.converted_resources.append( converted_rsc )
 
-                result_paths = [ ]
-                copyres_cmds = [ ]
-
-                res_compile_command = rcomp.RComp( self._env, converted_rsc, converted_rsg,
-                             rss_path,
-                             "-m045,046,047",
-                             self.sysincludes + self.includes,
-                             [ARGS.PLATFORM_HEADER],
-                             self.rssdefines,
-                             extra_depends )
+                # Registration resources are not localized
+                languages = self.languages
+                registration = _is_registration_resource( rss_path )
+                if registration:
+                    languages = [ "sc" ]
 
-                self._env.Depends( res_compile_command, self.converted_icons )
+                # Shared by the languages
+                depends = self._resourceDepends( rss_path, producers )
+                if extra_depends is not None:
+                    depends = list( extra_depends ) + depends
 
                 installfolder = []
-                if rss_notype.endswith( "_reg" ):
+                if registration:
                     installfolder.append( join( "private", "10003a3f", "import", "apps" ) )
                 else:
                     if ARGS.SYMBIAN_VERSION[0] > 8:
@@ -933,10 +1161,47 @@ class SymbianProgramHandler(object):
                       installfolder.append( join( "system", "apps", self.target ) )
                 installfolder = os.path.join( *installfolder )
 
-                rsc_filename = "%s.%s" % ( rss_notype, "rsc" )
-                # Copy to sis creation folder
-                ToPackage( self._env, self.package_drive_map, self.package,
-                           installfolder, converted_rsc, toemulator = False )
+                for index in xrange( len( languages ) ):
+                    extension, language_define = _resource_language( languages[index] )
+                    converted_rsc = join( self.output_folder, "%s.%s" % ( rss_notype, extension ) )
+                    self.converted_resources.append( converted_rsc )
+
+                    # The header does not depend on the language, so it is
+                    # created only with the first one of the list.
+                    rsg = None
+                    if index == 0:
+                        rsg = converted_rsg
+
+                    res_compile_command = rcomp.RComp( self._env, converted_rsc, rsg,
+                                 rss_path,
+                                 "-m045,046,047",
+                                 self.sysincludes + self.includes,
+                                 [ARGS.PLATFORM_HEADER],
+                                 self.rssdefines + [ language_define ],
+                                 depends )
+
+                    self._env.Depends( res_compile_command, self.converted_icons )
+
+                    # Copy to sis creation folder
+                    ToPackage( self._env, self.package_drive_map, self.package,
+                               installfolder, converted_rsc, toemulator = False )
+
+                    # _reg files copied to /epoc32/DATA/Z/private/10003a3f/apps/ on simulator
+                    if ARGS.COMPILER == ARGS.COMPILER_WINSCW:
+                        if registration:
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z", "private","10003a3f","apps"), converted_rsc )
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE, "Z", "private","10003a3f","apps"), converted_rsc )
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z",
+                                                    "private","10003a3f","import", "apps"), converted_rsc )
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE,
+                                                    "Z", "private","10003a3f", "import", "apps"), converted_rsc )
+
+                        else: # Copy normal resources to resource/apps folder
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z", "resource","apps"), converted_rsc )
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE, "Z", "resource", "apps"), converted_rsc )
+                            self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE,
+                                                    "Z", "system", "apps",
+                                                    self.target), converted_rsc )
 
                 includefolder = ARGS.INSTALL_EPOC32_INCLUDE
 
@@ -947,28 +1212,6 @@ class SymbianProgramHandler(object):
                 # Add created header to be added for build dependency
                 self.resource_headers.append( includepath )
 
-                # _reg files copied to /epoc32/DATA/Z/private/10003a3f/apps/ on simulator
-                if ARGS.COMPILER == ARGS.COMPILER_WINSCW:
-                    if "_reg" in rss_path.lower():
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z", "private","10003a3f","apps"), converted_rsc )
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE, "Z", "private","10003a3f","apps"), converted_rsc )
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z",
-                                                "private","10003a3f","import", "apps"), converted_rsc )
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE,
-                                                "Z", "private","10003a3f", "import", "apps"), converted_rsc )
-
-                    else: # Copy normal resources to resource/apps folder
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_DATA, "Z", "resource","apps"), converted_rsc )
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE, "Z", "resource", "apps"), converted_rsc )
-                        self._env.Install( join( ARGS.INSTALL_EPOC32_RELEASE,
-                                                "Z", "system", "apps",
-                                                self.target), converted_rsc )
-
-                # Depend on previous. TODO: Use SCons Preprocessor scanner.
-                if prev_resource is not None:
-                    self._env.Depends( rss_path, prev_resource )
-                prev_resource = includepath
-
     def _handleGCCEBuild(self):
         env = self._env
         output_lib   = ( self.targettype in ARGS.DLL_TARGETTYPES )
@@ -1297,9 +1540,14 @@ class SymbianProgramHandler(object):
 
         if self.rssdefines is None:
             self.rssdefines = []
-        self.rssdefines.append( r'LANGUAGE_SC' )
+        # LANGUAGE_ macros are added per language
         self.rssdefines.extend( self.uiddefines )
 
+        if not self.languages:
+            self.languages = [ "sc" ]
+        # A repeated language would define the same .rsc target twice
+        self.languages = _unique_languages( self.languages )
+
         # Check if this Symbian component is enabled
         if not self._isComponentEnabled():
             return None
@@ -1363,6 +1611,7 @@ class SymbianProgramHandler(object):
             #print self.output_folder + out_updir, src_updir
             self._env.VariantDir( self.output_folder + out_updir, src_updir, duplicate = ARGS.DO_DUPLICATE_SOURCES )
 
+        self._combineSources()
 
         #------------------------------------------------------- Generate help files
         self._handleHelp()
@@ -1444,3 +1693,5 @@ class SymbianProgramHandler(object):
 
 del publicapi
 del File
+
+lazyimport.record( "scons_symbian", time.time() - _IMPORT_START )
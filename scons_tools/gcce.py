@@ -75,10 +75,10 @@ res_action = SCons.Action.Action('$RCCOM', '$RCCOMSTR')
 res_builder = SCons.Builder.Builder(action=res_action, suffix='.o',
                                     source_scanner=SCons.Tool.SourceFileScanner)
 
-SCons.Tool.SourceFileScanner.add_scanner('.rss', SCons.Defaults.CScan)
-SCons.Tool.SourceFileScanner.add_scanner('.rsc', SCons.Defaults.CScan)
-SCons.Tool.SourceFileScanner.add_scanner('.rsg', SCons.Defaults.CScan)
-SCons.Tool.SourceFileScanner.add_scanner('.rpp', SCons.Defaults.CScan)
+from scons_symbian import rscscan
+for __x in rscscan.SUFFIXES:
+    SCons.Tool.SourceFileScanner.add_scanner( __x, rscscan.SCANNER )
+del __x
 
 def _abspath(path,env):
     """ Converts path into absolute path """
@@ -86,6 +86,33 @@ def _abspath(path,env):
     #import pdb;pdb.set_trace()
     return p
 
+#: Directory listings by path: ( mtime, { lowercase name : name } )
+_DIRECTORY_INDEX = {}
+
+def _directory_index( directory ):
+    """List directory once and index it case-insensitively.
+    The listing is refreshed when the mtime of the directory changes.
+    @return: ( mtime, index ). mtime is None if directory does not exist.
+    """
+    try:
+        mtime = os.stat( directory ).st_mtime
+    except OSError:
+        return None, {}
+
+    cached = _DIRECTORY_INDEX.get( directory )
+    if cached is not None and cached[0] == mtime:
+        return cached
+
+    index = {}
+    for name in os.listdir( directory ):
+        index[name.lower()] = name
+    cached = ( mtime, index )
+    _DIRECTORY_INDEX[directory] = cached
+    return cached
+
+#: Resolved library flags by ( LIBS, LIBPATH, RELEASE, LIBPATH mtimes )
+_LIBRARY_FLAGS = {}
+
 def resolve_targettype( target ):
     if target.lower().endswith(".exe"):
         return "exe"
@@ -273,10 +300,24 @@ def generate(env):
     def _findpath(env):
         # arm-none-symbianelf-ld does not respect the library search paths.
         # So we need to find them and generate absolute paths to the libraries.
-        #import pdb;pdb.set_trace()
+        # SCons expands this for every signature, so the directories are
+        # indexed and the result is memoized until a LIBPATH folder changes.
         LIBARGS  = [ "-lsupc++", "-lgcc" ]
+        libpath  = [ env.subst( x ) for x in env["LIBPATH"] ]
+        indexes  = [ _directory_index( x ) for x in libpath ]
+        release  = env.subst( "${RELEASE}" )
+
+        key = ( tuple( env["LIBS"] ), tuple( libpath ), release,
+                tuple( [ x[0] for x in indexes ] ) )
+        result = _LIBRARY_FLAGS.get( key )
+        if result is not None:
+            return result
+
+        # If not found, use the default path
+        # it may be built by some other target.
+        default = env.subst( r"${EPOCROOT}epoc32/release/armv5/${RELEASE}" )
+
         result   = []
-        dircache = {}
         for library in SYMBIAN_BASE_LIBRARIES + env["LIBS"]:
             
             # GCCE uses .dso instead of .lib for dynamic libs. .lib indicates
@@ -286,21 +327,17 @@ def generate(env):
             if "." not in library:
                 library += ".dso"
             
-            # If not found, use the default path 
-            # it may be built by some other target.
-            path = r"${EPOCROOT}epoc32/release/armv5/${RELEASE}/%s" % library
-            
-            for directory in env["LIBPATH"]:
-                p = join( directory, library)
-                p = env.subst( p )
-                if os.path.exists( p):
-                    path = p
+            path = default + "/" + library
+            for directory, ( _mtime, index ) in zip( libpath, indexes ):
+                name = index.get( library.lower() )
+                if name is not None:
+                    path = join( directory, name )
                     break
-            path = env.subst( path )
             result.append( path )
             
         result += LIBARGS
         result = " ".join( result )
+        _LIBRARY_FLAGS[key] = result
         
         return result
     
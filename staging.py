@@ -0,0 +1,138 @@
+"""
+Staging of the build results into the package, emulator and SDK folders.
+
+With stage=link the files are hardlinked and with stage=reflink cloned
+copy-on-write, which only works on file systems supporting it, such as
+Btrfs and XFS on Linux. If the link cannot be made, for example because
+the folders are on different file systems, the file is copied. The
+default stage=copy always copies.
+
+A hardlinked file shares the contents with the build result. Staging
+removes the old destination first, so writing the staged file never
+changes the build result. The other direction is not protected: a tool
+rewriting the build result in place also changes the staged hardlink
+until it is staged again. Use stage=reflink or copy if some tool
+modifies its outputs in place after they have been staged.
+
+Only the package, emulator and SDK copies made by SCons for Symbian are
+staged, the INSTALL function of the environments is not changed. The
+number of linked and copied files is printed at the end of the build.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import atexit
+import os
+import shutil
+import stat
+import sys
+import threading
+
+import SCons.Action
+
+#: Staging mode: link, reflink or copy
+MODE = ARGS.STAGE
+
+#: ioctl request for cloning a file on Linux
+FICLONE = 0x40049409
+
+_LOCK = threading.Lock()
+#: Number of staged files by method
+COUNTS = { "link" : 0, "reflink" : 0, "copy" : 0 }
+
+def _count( method ):
+    _LOCK.acquire()
+    try:
+        COUNTS[method] += 1
+    finally:
+        _LOCK.release()
+
+def _link( source, dest ):
+    """Hardlink. Raises OSError or AttributeError if not possible."""
+    os.link( source, dest )
+
+def _reflink( source, dest ):
+    """Clone the file. Raises IOError or OSError if not possible."""
+    if not sys.platform.startswith( "linux" ):
+        raise OSError( "reflink not supported on %s" % sys.platform )
+
+    import fcntl
+    src = open( source, "rb" )
+    try:
+        dst = open( dest, "wb" )
+        try:
+            fcntl.ioctl( dst.fileno(), FICLONE, src.fileno() )
+        finally:
+            dst.close()
+    except ( IOError, OSError ):
+        if os.path.exists( dest ):
+            os.remove( dest )
+        raise
+    finally:
+        src.close()
+    shutil.copystat( source, dest )
+
+def _copy( source, dest ):
+    """Copy like SCons does and make the copy writable"""
+    shutil.copy2( source, dest )
+    st = os.stat( source )
+    os.chmod( dest, stat.S_IMODE( st[stat.ST_MODE] ) | stat.S_IWRITE )
+
+_METHODS = { "link" : _link, "reflink" : _reflink }
+
+def stage_file( dest, source ):
+    """Stage source file to dest with the selected method.
+    @return: The method used.
+    """
+    folder = os.path.dirname( dest )
+    if folder and not os.path.isdir( folder ):
+        os.makedirs( folder )
+    if os.path.lexists( dest ):
+        os.remove( dest )
+
+    method = _METHODS.get( MODE )
+    if method is not None:
+        try:
+            method( source, dest )
+            _count( MODE )
+            return MODE
+        except ( IOError, OSError, AttributeError ):
+            # Different file system or not supported
+            pass
+
+    _copy( source, dest )
+    _count( "copy" )
+    return "copy"
+
+def _stage_command( target, source, env ): #IGNORE:W0613
+    stage_file( target[0].abspath, source[0].abspath )
+    return 0
+
+#: Action staging the source to the target
+STAGE_ACTION = SCons.Action.Action( _stage_command, 'Stage file: "$SOURCE" as "$TARGET"' )
+
+def Install( env, folder, source ):
+    """Stage file into folder like env.Install does with a single file.
+    @return: Target nodes.
+    """
+    target = os.path.join( folder, os.path.basename( str( source ) ) )
+    return env.Command( target, source, STAGE_ACTION )
+
+def _stage_action( dest, source ):
+    stage_file( dest, source )
+    return 0
+
+#: Action factory replacing Copy for staging a file
+Stage = SCons.Action.ActionFactory( _stage_action,
+                                    lambda dest, src: 'Stage("%s", "%s")' % ( dest, src ),
+                                    convert = str )
+
+def summary():
+    return "scons: Staged files: %d linked, %d reflinked, %d copied (stage=%s)" % \
+            ( COUNTS["link"], COUNTS["reflink"], COUNTS["copy"], MODE )
+
+def _finish():
+    if sum( COUNTS.values() ) > 0:
+        print summary()
+
+atexit.register( _finish )
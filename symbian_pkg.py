@@ -2,6 +2,9 @@
 
 from SCons.Script import DefaultEnvironment
 import arguments
+import buildtrace
+import cStringIO
+import hashlib
 import os
 import sys
 from relpath import relpath
@@ -81,12 +84,32 @@ class PKGHandler:
         self.pkg_args = {}
         self.pkg_sis = {}
         self.pkg_template = {}    
+        #: Package variant: package sharing its payload
+        self.pkg_base = {}
         
     def Package( self, package ):
         pkg = self.pkg_files.get( package, {} )
         self.pkg_files[package] = pkg        
         return pkg
     
+    def PackageFiles( self, package ):
+        """ Files of the package including the payload of its base package.
+        The files of the variant replace the base files with the same
+        target path.
+        """
+        files = self.Package( package )
+        base = self.pkg_base.get( package, None )
+        if base is None:
+            return files
+        
+        overlaid = set( [ x.replace( "\\", "/" ).lower() for x in files.values() ] )
+        result = {}
+        for source, target in self.PackageFiles( base ).items():
+            if target.replace( "\\", "/" ).lower() not in overlaid:
+                result[source] = target
+        result.update( files )
+        return result
+    
     def PackageArgs( self, package ):
         args = self.pkg_args.get( package,
                                   { "version" : ( "1", "0", "00000" ),
@@ -97,19 +120,68 @@ class PKGHandler:
         self.pkg_args[package] = args  
         return args
      
+    def PkgDigest( self, pkgfilename ):
+        """ Digest of the sorted file map, the arguments and the template
+        the pkg file is generated from.
+        """
+        package = self.pkg_sis[pkgfilename]
+        h = hashlib.sha1()
+        
+        files = self.PackageFiles( package ).items()
+        files.sort()
+        for source, target in files:
+            h.update( "%s\0%s\0" % ( source, target ) )
+        
+        pkgargs = self.PackageArgs( package ).items()
+        pkgargs.sort()
+        h.update( repr( pkgargs ) )
+        
+        template = self.pkg_template.get( pkgfilename, None )
+        if template is not None:
+            if os.path.isfile( template ):
+                f = open( template, 'rb' )
+                try:
+                    template = f.read()
+                finally:
+                    f.close()
+            h.update( template )
+        
+        return h.hexdigest()
+    
+    def _writePkg( self, pkgfilename, content, mode ):
+        """ Write the pkg file unless it already has the content.
+        Unchanged file is not touched, so makesis is not run again.
+        """
+        if os.path.isfile( pkgfilename ):
+            f = open( pkgfilename, mode.replace( "w", "r" ) )
+            try:
+                unchanged = ( f.read() == content )
+            finally:
+                f.close()
+            if unchanged:
+                return
+        
+        f = open( pkgfilename, mode )
+        try:
+            f.write( content )
+        finally:
+            f.close()
+    
+    @buildtrace.traced( "pkg" )
     def GeneratePkg( self, target = None, source = None, env = None ):
         """ SCons Command to generate PKG file
         @param target: Contains the pkg filename
         """
         pkgfilename = target[0].path
         package = self.pkg_sis[pkgfilename]
-        files = self.Package( package )
+        files = self.PackageFiles( package )
         pkgargs = self.PackageArgs( package )
         
         template = self.pkg_template.get(pkgfilename, None)
                 
         if template is not None:
             import preppy # Import here. Slow so imported only if needed.
+            preppy.CACHE_FOLDER = arguments.PREPPY_CACHE
             
             # Get contents if file
             if os.path.isfile(template):
@@ -119,19 +191,22 @@ class PKGHandler:
                 f.close()                
             
             m = preppy.getModule("pkg", sourcetext=template)
-            outputfile = open( pkgfilename, 'wb')
+            outputfile = cStringIO.StringIO()
             
             data = {}
             data["files"] = files
             data.update( pkgargs )
             print( "scons: Generating pkg '%s' from preppy template " % pkgfilename )
             m.run( data, outputfile = outputfile )
+            self._writePkg( pkgfilename, outputfile.getvalue(), 'wb' )
             return
                 
         # TODO: Use preppy here as well with default template     
         print "Creating pkg", pkgfilename        
-        f = open( pkgfilename, 'w' )
+        f = cStringIO.StringIO()
                              
+        # Formatted into a copy, the arguments are part of the pkg digest
+        pkgargs = dict( pkgargs )
         if type( pkgargs["uid"] ) != str:
             pkgargs["uid"] = hex( pkgargs["uid"] ).replace("L","")
         
@@ -171,5 +246,19 @@ class PKGHandler:
             
             f.write( '%-50s - "%s"\n' % ( '"%s"' % x, t ) )
         
-        f.close()
-        
+        self._writePkg( pkgfilename, f.getvalue(), 'w' )
+
+class PkgDigestValue( object ):
+    """ Value of the pkg digest node. The digest is computed each time
+    the value is read, so it always reflects the files added so far.
+    SCons reads it when checking the pkg file, after all files have been
+    added to the package.
+    """
+    def __init__( self, handler, pkgfilename ):
+        self.handler = handler
+        self.pkgfilename = pkgfilename
+    
+    def __str__( self ):
+        return self.handler.PkgDigest( self.pkgfilename )
+    
+    __repr__ = __str__
@@ -0,0 +1,41 @@
+""" Compares the compiler warnings of two builds stored with diagnostics=path.jsonl """
+import sys
+
+def diff( oldpath, newpath, key ):
+    from scons_symbian import diagnostics
+
+    old = dict( [ ( x[1], x[0] ) for x in diagnostics.count( diagnostics.load( oldpath ), key ) ] )
+    new = dict( [ ( x[1], x[0] ) for x in diagnostics.count( diagnostics.load( newpath ), key ) ] )
+
+    changes = []
+    for value in set( old.keys() + new.keys() ):
+        delta = new.get( value, 0 ) - old.get( value, 0 )
+        if delta != 0:
+            changes.append( ( -delta, value ) )
+    changes.sort()
+
+    for delta, value in changes:
+        print "%+6d  %s" % ( -delta, value )
+
+    added = sum( [ -x[0] for x in changes if x[0] < 0 ] )
+    print "%d new, %d fixed by %s" % ( added, sum( [ x[0] for x in changes if x[0] > 0 ] ), key )
+    return added
+
+def start():
+
+    from optparse import OptionParser
+
+    parser = OptionParser( usage = "%prog [options] old.jsonl new.jsonl" )
+    parser.add_option("-k", "", dest="key", default="class",
+                  help="Compare counts by: class, file, component or severity")
+
+    (options, args) = parser.parse_args()
+    if len( args ) != 2:
+        parser.error( "Give the diagnostics of the old and the new build" )
+
+    # Non-zero exit status if new diagnostics were added
+    if diff( args[0], args[1], options.key ) > 0:
+        sys.exit( 1 )
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,68 @@
+""" Measures parallel icon conversion with a generated SConstruct """
+import os
+import shutil
+import subprocess as sp
+import sys
+import time
+
+SCONSTRUCT = """
+from scons_symbian import *
+
+for index in xrange( %(count)d ):
+    SymbianIcon( [ "icon.svg" ], mif_filename = "bench%%d.mif" %% index,
+                 mbg_filename = "bench%%d.mbg" %% index )
+"""
+
+def create_project( folder, icon, count ):
+    if os.path.exists( folder ):
+        shutil.rmtree( folder )
+    os.makedirs( folder )
+    shutil.copyfile( icon, os.path.join( folder, "icon.svg" ) )
+
+    f = open( os.path.join( folder, "SConstruct" ), "w" )
+    try:
+        f.write( SCONSTRUCT % { "count" : count } )
+    finally:
+        f.close()
+
+def build( folder, jobs, scons ):
+    """Clean build of the project
+    @return: Build time in seconds
+    """
+    sp.call( "%s -c -Q" % scons, shell = True, cwd = folder )
+    start = time.time()
+    result = sp.call( "%s -j%d" % ( scons, jobs ), shell = True, cwd = folder )
+    if result != 0:
+        print "Build failed with -j%d" % jobs
+        sys.exit( result )
+    return time.time() - start
+
+def start():
+
+    from optparse import OptionParser
+
+    parser = OptionParser( usage = "%prog [options] icon.svg" )
+    parser.add_option("-n", "", dest="count", type="int", default=20,
+                  help="Number of icon files to convert")
+    parser.add_option("-j", "", dest="jobs", type="int", default=4,
+                  help="Number of parallel jobs")
+    parser.add_option("-d", "", dest="folder", default="mifconv_benchmark",
+                  help="Folder of the generated project")
+    parser.add_option("", "--scons", dest="scons", default="scons",
+                  help="SCons command")
+
+    (options, args) = parser.parse_args()
+    if len( args ) != 1:
+        parser.error( "Give the icon to convert" )
+
+    create_project( options.folder, args[0], options.count )
+    serial   = build( options.folder, 1, options.scons )
+    parallel = build( options.folder, options.jobs, options.scons )
+
+    print "%d icon files" % options.count
+    print "-j1:  %.2fs" % serial
+    print "-j%d:  %.2fs" % ( options.jobs, parallel )
+    print "speedup: %.2fx" % ( serial / max( parallel, 1e-9 ) )
+
+if __name__ == "__main__":
+    start()
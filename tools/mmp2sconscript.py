@@ -74,6 +74,8 @@ class MMP2SConscript(object):
     
     def generate_sconscript(self, data):
         from scons_symbian import preppy
+        from scons_symbian.config import USERCONFIG_FOLDER
+        preppy.CACHE_FOLDER = os.path.join( USERCONFIG_FOLDER, "preppycache" )
         
         m = preppy.getModule("sconscript", sourcetext=TEMPLATE_SCONSCRIPT)
         
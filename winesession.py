@@ -0,0 +1,196 @@
+"""
+Managed wine session for running the SDK's Windows tools on Linux.
+
+Every wine command has to start the wineserver unless one is already
+running, and the server exits right after the last wine process. With
+wineserver=N the server is started once for the build and kept running N
+seconds after the last tool has exited, so the following tools and builds
+start warm.
+
+With winebatch=true the tools are run through a pool of long-lived wine
+cmd.exe shells, which read the commands from a pipe. The wine environment
+is then loaded once per parallel job instead of once per tool.
+"""
+__license__ = "MIT License"
+
+import arguments as ARGS
+import atexit
+import colorizer
+import os
+import re
+import subprocess as sp
+import sys
+import tempfile
+import threading
+import time
+
+import SCons.Action
+
+#: Are the tools run with wine
+ENABLED = sys.platform == "linux2"
+
+#: Printed by the shell after each command, followed by the exit status.
+DONE_MARKER = "__SCONS_WINE_DONE__"
+
+#: Finds the marker also after a prompt, e.g. Z:\build>__SCONS_WINE_DONE__ 0.
+#: The echoed echo command itself is not matched.
+DONE_RE = re.compile( r"(?<!echo )%s (-?\d+)" % DONE_MARKER )
+
+_LOCK = threading.Lock()
+_SERVER_STARTED = False
+#: Idle wine shells
+_IDLE = []
+#: All started wine shells
+_SHELLS = []
+
+def start_server():
+    """Start a persistent wineserver unless already done.
+    Does nothing if the server is already running for this prefix.
+    """
+    global _SERVER_STARTED
+    if ARGS.WINESERVER_TIMEOUT <= 0:
+        return
+
+    _LOCK.acquire()
+    try:
+        if _SERVER_STARTED:
+            return
+        _SERVER_STARTED = True
+    finally:
+        _LOCK.release()
+
+    devnull = open( os.devnull, "w" )
+    try:
+        # The server detaches itself. Fails if one is already running.
+        sp.call( [ "wineserver", "-p%d" % ARGS.WINESERVER_TIMEOUT ],
+                 stdout = devnull, stderr = devnull )
+    except OSError:
+        pass
+    finally:
+        devnull.close()
+
+def _start_server_action( target, source, env ): #IGNORE:W0613
+    start_server()
+    return 0
+
+#: Silent action starting the wineserver before a wine command
+START_SERVER = SCons.Action.Action( _start_server_action, None )
+
+def windows_path( path ):
+    """Convert absolute Linux path to the wine Z: drive"""
+    if path.startswith( "/" ):
+        return "Z:" + path.replace( "/", "\\" )
+    return path
+
+class WineShell( object ):
+    """wine cmd.exe fed over a pipe.
+
+    The commands are written into a batch file of the shell and called from
+    there. In a batch file %% is a literal %, so the % characters of the
+    defines and paths are escaped and not expanded as variables.
+    """
+
+    def __init__( self ):
+        fd, self.batchfile = tempfile.mkstemp( prefix = "sconswine", suffix = ".bat" )
+        os.close( fd )
+        self.process = sp.Popen( [ "wine", "cmd.exe" ], cwd = os.getcwd(),
+                                 stdin = sp.PIPE, stdout = sp.PIPE,
+                                 stderr = sp.STDOUT )
+        # Skip the banner of the shell
+        self._send( "@echo off" )
+
+    def _send( self, line ):
+        """Send command line to the shell and wait for it to finish.
+        @return: ( exit status, output )
+        """
+        self.process.stdin.write( "%s\r\n" % line )
+        self.process.stdin.write( "echo %s %%ERRORLEVEL%%\r\n" % DONE_MARKER )
+        self.process.stdin.flush()
+
+        output = []
+        for line in iter( self.process.stdout.readline, "" ):
+            m = DONE_RE.search( line )
+            if m is not None:
+                return int( m.group( 1 ) ), "".join( output )
+            output.append( line.replace( "\r\n", "\n" ) )
+        raise IOError( "wine shell exited" )
+
+    def run( self, cmd ):
+        """Run command in the shell.
+        @return: ( exit status, output )
+        """
+        f = open( self.batchfile, "wb" )
+        try:
+            f.write( "@%s\r\n" % cmd.replace( "%", "%%" ) )
+        finally:
+            f.close()
+        return self._send( 'call "%s"' % windows_path( self.batchfile ) )
+
+    def close( self ):
+        try:
+            self.process.stdin.write( "exit\r\n" )
+            self.process.stdin.close()
+            self.process.wait()
+        finally:
+            os.remove( self.batchfile )
+
+def _acquire():
+    """Get idle wine shell or start a new one"""
+    _LOCK.acquire()
+    try:
+        if _IDLE:
+            return _IDLE.pop()
+    finally:
+        _LOCK.release()
+
+    shell = WineShell()
+    _LOCK.acquire()
+    try:
+        _SHELLS.append( shell )
+    finally:
+        _LOCK.release()
+    return shell
+
+def _release( shell ):
+    _LOCK.acquire()
+    try:
+        _IDLE.append( shell )
+    finally:
+        _LOCK.release()
+
+def _close_shells():
+    for shell in _SHELLS:
+        try:
+            shell.close()
+        except ( IOError, OSError ):
+            pass
+
+atexit.register( _close_shells )
+
+def run( executable, args ):
+    """Run Windows tool.
+
+    @param executable: Path to the .exe.
+    @param args: Command line arguments as a string.
+    @return: Exit status.
+    """
+    if not ENABLED:
+        return os.system( '%s %s' % ( executable, args ) )
+
+    start_server()
+    if ARGS.WINE_BATCH:
+        shell = _acquire()
+        start = time.time()
+        try:
+            result, output = shell.run( '"%s" %s' % ( windows_path( executable ), args ) )
+        except ( IOError, OSError, ValueError ):
+            # Do not reuse the broken shell, run the tool directly instead
+            pass
+        else:
+            _release( shell )
+            # Colored and parsed like the output of the spawned commands
+            colorizer.command_output( [ "wine", executable ] + args.split(),
+                                      output, start, result )
+            return result
+
+    return os.system( 'wine "%s" %s' % ( executable, args ) )
@@ -6,6 +6,8 @@ __license__ = "MIT License"
 from SCons.Environment import Environment
 from arguments import * #IGNORE:W0611
 import arguments as ARGS
+import objectcache
+import pch
 import textwrap
 
 DEFAULT_WINSCW_DEFINES = DEFAULT_SYMBIAN_DEFINES[:]
@@ -85,6 +87,33 @@ def make_capability_hex(capabilities):
 
 _WINSCW_ENV = None
 
+def _use_pch( env, cc_flags, sysincludes, sysinclude_folders, common_defines, platform_header ):
+    """Include precompiled platform header into C++ sources.
+    mwccsym2 precompiles for a single language, so C sources still include
+    the plain header. The object cache preprocesses with the plain header,
+    mwccsym2 -E does not accept the precompiled one. The header is compiled
+    with the common defines only, so the components share it.
+    """
+    flags = cc_flags + ' -cwd source -I- %s' % sysincludes
+    key = pch.digest( COMPILER, RELEASE, env.subst( "$CXX" ), flags, common_defines )
+    folder = pch.get_folder( key )
+    header = join( folder, "s4s_winscw.h" )
+    content = '#include "%s"\n' % platform_header
+
+    command = "$CXX %s $_CPPDEFFLAGS -lang c++ -precompile $TARGET $SOURCE" % flags
+    # The system includes are given in the flags, the scanner needs them
+    # in CPPPATH to follow the includes of the platform header.
+    node = pch.get_node( env, key, join( folder, "s4s_winscw.mch" ), header, content,
+                         command, scanned = [ PLATFORM_HEADER ],
+                         CPPPATH = sysinclude_folders,
+                         CPPDEFINES = common_defines )
+
+    include = '-include "%s"' % platform_header
+    env.Append( CFLAGS = " " + include )
+    env["CXXPPFLAGS"] = "%s %s" % ( env["CXXFLAGS"], include )
+    env.Append( CXXFLAGS = ' -include "%s"' % node.abspath )
+    env["PCH_CXX"] = node
+
 def create_environment( target,
                         targettype,
                         includes,
@@ -128,18 +157,19 @@ def create_environment( target,
         [ os.path.normpath( os.path.join(USER_LIBPATH, x) ).lower() for x in user_libraries ] +
         [ os.path.normpath( LIBPATH + x ).lower() for x in libraries ] +
         win32_libraries )
-    defines.extend( DEFAULT_WINSCW_DEFINES )
-    defines.extend( CMD_LINE_DEFINES )
+    # Shared by the components, the precompiled header is built with these
+    common_defines = DEFAULT_WINSCW_DEFINES + CMD_LINE_DEFINES
 
     # TODO: Take lib out of DLL_TARGETTYPES
     if targettype != TARGETTYPE_LIB:
         if targettype in DLL_TARGETTYPES:
-            defines.append( "__DLL__" )
+            common_defines.append( "__DLL__" )
             LIBRARIES.append( join(EPOC32_RELEASE, "edll.lib") )
         else:
-            defines.append( "__EXE__" )
+            common_defines.append( "__EXE__" )
             LIBRARIES.append( join(EPOC32_RELEASE, "eexe.lib") )
-    defines = [ '"%s"' % x for x in defines ]
+    common_defines = [ '"%s"' % x for x in common_defines ]
+    defines = [ '"%s"' % x for x in defines ] + common_defines
 
     cc_flags = '-g -O0 -inline off -align 4 -warnings on -w noimplicit,nohidevirtual,nounusedexpr -msgstyle gcc -enum int -str pool -exc ms -trigraphs on'
     if win32_headers:
@@ -215,6 +245,7 @@ def create_environment( target,
                              }
 
     platform_header = os.path.basename( PLATFORM_HEADER )
+    sysinclude_folders = list( sysincludes )
     if len( sysincludes ) > 0:
         sysincludes = "-I" + " -I".join( sysincludes )
     else:
@@ -251,6 +282,9 @@ def create_environment( target,
                     PROGSUFFIX = "." + targettype,
 
         )
+        objectcache.install( _WINSCW_ENV )
+        if ARGS.PCH_ENABLED:
+            pch.install_emitters( _WINSCW_ENV )
 
         env = _WINSCW_ENV
     else:
@@ -262,7 +296,9 @@ def create_environment( target,
                  # Static library settings
                  CPPPATH = includes,
                  CPPDEFINES = defines,
-                 CCFLAGS = cc_flags + ' -cwd source -I- %s -include "%s"' % ( sysincludes, platform_header ),
+                 CCFLAGS = cc_flags + ' -cwd source -I- %s' % sysincludes,
+                 CFLAGS = "",
+                 CXXFLAGS = "",
 
                  # Linker settings
                  LINKFLAGS = LINKFLAGS,
@@ -270,4 +306,9 @@ def create_environment( target,
                  PROGSUFFIX = "." + targettype,
     )
 
+    if ARGS.PCH_ENABLED:
+        _use_pch( env, cc_flags, sysincludes, sysinclude_folders, common_defines, platform_header )
+    else:
+        env.Append( CCFLAGS = ' -include "%s"' % platform_header )
+
     return env
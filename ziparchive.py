@@ -0,0 +1,132 @@
+"""
+Incremental and deterministic zip archives.
+
+A manifest of the member digests is kept next to the archive. When the
+archive is updated, only the changed members are compressed again. The
+compressed data of the unchanged members is copied from the previous
+archive as such.
+
+The members are sorted by name and written with a fixed timestamp and
+permissions, so the same inputs always produce the same archive.
+"""
+__license__ = "MIT License"
+
+from artifactcache import file_digest
+import cPickle
+import os
+import stat
+import zipfile
+
+#: Timestamp of all members, the earliest one zip supports
+DATE_TIME = ( 1980, 1, 1, 0, 0, 0 )
+
+#: File type and permissions of all members
+EXTERNAL_ATTR = ( stat.S_IFREG | 0644 ) << 16
+
+def manifest_path( zippath ):
+    return zippath + ".manifest"
+
+def _load_manifest( zippath ):
+    """Read the member digests of the previous archive
+    @return: Dictionary of arcname: digest. Empty if not available.
+    """
+    if not os.path.exists( zippath ):
+        return {}
+    try:
+        f = open( manifest_path( zippath ), "rb" )
+        try:
+            return cPickle.load( f )
+        finally:
+            f.close()
+    except Exception: #IGNORE:W0703 Missing or corrupted manifest
+        return {}
+
+def _save_manifest( zippath, manifest ):
+    f = open( manifest_path( zippath ), "wb" )
+    try:
+        cPickle.dump( manifest, f, 2 )
+    finally:
+        f.close()
+
+def _member_info( arcname ):
+    info = zipfile.ZipInfo( arcname, DATE_TIME )
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = EXTERNAL_ATTR
+    return info
+
+def _copy_member( source, info, target ):
+    """Copy the compressed data of a member from source to target zip."""
+    # Skip the local header of the source member
+    source.fp.seek( info.header_offset )
+    header = source.fp.read( zipfile.sizeFileHeader )
+    namelength  = ord( header[26] ) + ( ord( header[27] ) << 8 )
+    extralength = ord( header[28] ) + ( ord( header[29] ) << 8 )
+    source.fp.seek( namelength + extralength, 1 )
+    data = source.fp.read( info.compress_size )
+
+    copied = _member_info( info.filename )
+    copied.CRC = info.CRC
+    copied.compress_size = info.compress_size
+    copied.file_size = info.file_size
+    copied.header_offset = target.fp.tell()
+
+    target.fp.write( copied.FileHeader() )
+    target.fp.write( data )
+    target.filelist.append( copied )
+    target.NameToInfo[copied.filename] = copied
+
+def update( zippath, files ):
+    """Create or update the archive.
+
+    @param zippath: Path to the archive.
+    @param files: List of ( source path, arcname ).
+    @return: ( number of compressed members, number of copied members )
+    """
+    members = {}
+    for source, arcname in files:
+        members[arcname.replace( "\\", "/" )] = source
+    arcnames = members.keys()
+    arcnames.sort()
+
+    oldmanifest = _load_manifest( zippath )
+    manifest = {}
+    for arcname in arcnames:
+        manifest[arcname] = file_digest( members[arcname] )
+
+    old = None
+    if oldmanifest:
+        try:
+            old = zipfile.ZipFile( zippath, "r" )
+        except ( IOError, zipfile.BadZipfile ):
+            old = None
+
+    tmppath = zippath + ".tmp"
+    compressed = copied = 0
+    new = zipfile.ZipFile( tmppath, "w", zipfile.ZIP_DEFLATED )
+    try:
+        for arcname in arcnames:
+            if old is not None and oldmanifest.get( arcname ) == manifest[arcname] \
+               and arcname in old.NameToInfo:
+                _copy_member( old, old.NameToInfo[arcname], new )
+                copied += 1
+                continue
+
+            f = open( members[arcname], "rb" )
+            try:
+                data = f.read()
+            finally:
+                f.close()
+            new.writestr( _member_info( arcname ), data )
+            compressed += 1
+    finally:
+        new.close()
+        if old is not None:
+            old.close()
+
+    # Rename does not replace existing file on Windows
+    if os.path.exists( zippath ):
+        os.remove( zippath )
+    os.rename( tmppath, zippath )
+    _save_manifest( zippath, manifest )
+
+    return compressed, copied